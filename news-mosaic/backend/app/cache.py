@@ -0,0 +1,272 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+from .settings import (
+    CACHE_PATH,
+    CACHE_TTL_S,
+    CACHE_EVICT_EVERY,
+    TILE_CACHE_MAX_ENTRIES,
+    SUMMARY_CACHE_MAX_ENTRIES,
+    MOSAIC_CACHE_TTL_S,
+    MOSAIC_CACHE_STALE_S,
+    MOSAIC_CACHE_MAX_ENTRIES,
+    MOSAIC_CACHE_DEGRADED_TTL_S,
+)
+
+
+class LabelCache:
+    """SQLite-backed key -> JSON cache with TTL and LRU-style size bound."""
+
+    def __init__(self, path: str, table: str, ttl_s: float, max_entries: int):
+        self.table = table
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table}(accessed)")
+        self._db.execute(f"CREATE INDEX IF NOT EXISTS {table}_created ON {table}(created)")
+        # 行数的近似值（REPLACE 会多算），只用来判断要不要淘汰；淘汰时重新数一次
+        (self._size,) = self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, dict]:
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        found: dict[str, dict] = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT key, value FROM {self.table} WHERE key IN ({marks}) AND created >= ?",
+                    (*chunk, now - self.ttl_s),
+                ).fetchall()
+                for k, v in rows:
+                    found[k] = json.loads(v)
+            if found:
+                self._db.executemany(
+                    f"UPDATE {self.table} SET accessed = ? WHERE key = ?",
+                    [(now, k) for k in found],
+                )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, key: str, value: dict) -> None:
+        self.put_many({key: value})
+
+    def put_many(self, items: dict[str, dict]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                [(k, json.dumps(v), now, now) for k, v in items.items()],
+            )
+            self._size += len(items)
+            self._writes += 1
+            if self._size > self.max_entries or self._writes % max(1, CACHE_EVICT_EVERY) == 0:
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        cur = self._db.execute(f"DELETE FROM {self.table} WHERE created < ?", (now - self.ttl_s,))
+        self.evictions += max(0, cur.rowcount)
+        (size,) = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        self._size = size
+        overflow = size - self.max_entries
+        if overflow > 0:
+            # 最久没被访问的先淘汰
+            cur = self._db.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY accessed ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += max(0, cur.rowcount)
+            self._size -= max(0, cur.rowcount)
+
+    def stats(self) -> dict:
+        with self._lock:
+            (size,) = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+class Degraded:
+    """Wraps a build result that contains fallbacks; ResponseCache keeps it only briefly."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+class DegradedBuild(Exception):
+    """A background refresh came back degraded; it was discarded instead of cached."""
+
+
+class ResponseCache:
+    """In-process TTL + LRU cache with single-flight builds and stale-while-revalidate."""
+
+    def __init__(self, ttl_s: float, stale_s: float, max_entries: int, degraded_ttl_s: float = 0.0):
+        self.ttl_s = ttl_s
+        self.stale_s = stale_s
+        self.max_entries = max_entries
+        self.degraded_ttl_s = degraded_ttl_s
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.degraded_builds = 0
+        # key -> (value, created, degraded)
+        self._entries: OrderedDict[Hashable, tuple[Any, float, bool]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        # refresh() 起的后台构建；交互请求不 join 它们（否则会被限在预热的槽位里）
+        self._background: set[asyncio.Task] = set()
+
+    def _fresh(self, entry: tuple[Any, float, bool]) -> bool:
+        _, created, degraded = entry
+        return time.monotonic() - created < (self.degraded_ttl_s if degraded else self.ttl_s)
+
+    def claim(
+        self, key: Hashable, build: Callable[[], Awaitable[Any]]
+    ) -> tuple[Optional[Any], Optional[asyncio.Task], bool]:
+        # 流式接口用，返回 (value, task, owner)：
+        # 有新鲜结果 -> (value, None, False)；有交互构建在跑 -> (None, task, False)；
+        # 否则把 build 登记为 in-flight -> (None, task, True)，/mosaic 和别的流会 join 它
+        entry = self._entries.get(key)
+        if entry is not None and self._fresh(entry):
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0], None, False
+        task = self._inflight.get(key)
+        if task is not None and task not in self._background:
+            self.coalesced += 1
+            return None, task, False
+        self.misses += 1
+        return None, self._start(key, build), True
+
+    def put(self, key: Hashable, value: Any) -> Any:
+        # value 可以是 Degraded；返回解包后的值
+        degraded = isinstance(value, Degraded)
+        if degraded:
+            value = value.value
+            self.degraded_builds += 1
+            if self.degraded_ttl_s <= 0:
+                self._entries.pop(key, None)
+                return value
+        self._entries[key] = (value, time.monotonic(), degraded)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    async def get_or_build(self, key: Hashable, build: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, created, degraded = entry
+            age = time.monotonic() - created
+            if self._fresh(entry):
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            if not degraded and age < self.ttl_s + self.stale_s:
+                # 先返回旧结果，后台重建
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                if key not in self._inflight:
+                    self._start(key, build)
+                return value
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is not None and task not in self._background:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+        # shield：某个客户端断开不会取消大家共享的那次计算
+        return await asyncio.shield(self._start(key, build))
+
+    def age(self, key: Hashable) -> Optional[float]:
+        entry = self._entries.get(key)
+        return None if entry is None else time.monotonic() - entry[1]
+
+    def degraded(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[2]
+
+    async def refresh(self, key: Hashable, build: Callable[[], Awaitable[Any]]) -> Any:
+        # 后台强制重建：有 in-flight 的计算就直接 join；带 fallback 的结果不写缓存，抛 DegradedBuild
+        return await self._start(key, build, background=True)
+
+    def _start(
+        self, key: Hashable, build: Callable[[], Awaitable[Any]], background: bool = False
+    ) -> asyncio.Task:
+        task = self._inflight.get(key)
+        # 交互请求碰上后台构建：另起一个交互优先级的构建，后台那个跑完不再写缓存
+        if task is None or (not background and task in self._background):
+            task = asyncio.create_task(self._run(key, build, background))
+            self._inflight[key] = task
+            if background:
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            # 后台刷新失败时没人 await，这里把异常取走
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def _run(self, key: Hashable, build: Callable[[], Awaitable[Any]], background: bool) -> Any:
+        task = asyncio.current_task()
+        try:
+            value = await build()
+            if background and isinstance(value, Degraded):
+                raise DegradedBuild(key)
+            if background and self._inflight.get(key) is not task:
+                return value
+            return self.put(key, value)
+        finally:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+    def stats(self) -> dict:
+        total = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "degraded_builds": self.degraded_builds,
+            "hit_rate": ((total - self.misses) / total) if total else 0.0,
+        }
+
+
+tile_cache = LabelCache(CACHE_PATH, "tiles", CACHE_TTL_S, TILE_CACHE_MAX_ENTRIES)
+summary_cache = LabelCache(CACHE_PATH, "summaries", CACHE_TTL_S, SUMMARY_CACHE_MAX_ENTRIES)
+mosaic_cache = ResponseCache(
+    MOSAIC_CACHE_TTL_S, MOSAIC_CACHE_STALE_S, MOSAIC_CACHE_MAX_ENTRIES, MOSAIC_CACHE_DEGRADED_TTL_S
+)
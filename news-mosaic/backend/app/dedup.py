@@ -0,0 +1,89 @@
+import re
+import zlib
+from typing import List
+import numpy as np
+from .models import Article, AlternateSource
+from .settings import DEDUP_ENABLED, DEDUP_THRESHOLD, DEDUP_NUM_PERM
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, _PRIME, size=DEDUP_NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, size=DEDUP_NUM_PERM, dtype=np.uint64)
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+def _shingles(text: str) -> np.ndarray:
+    tokens = _TOKEN.findall(text.lower())
+    if len(tokens) < 2:
+        grams = tokens
+    else:
+        grams = [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return np.fromiter(
+        {zlib.crc32(g.encode("utf-8")) % _PRIME for g in grams}, dtype=np.uint64
+    )
+
+def minhash(text: str) -> np.ndarray:
+    sh = _shingles(text)
+    if sh.size == 0:
+        return np.full(DEDUP_NUM_PERM, _PRIME, dtype=np.uint64)
+    # (a * x + b) mod p，a、x < 2^31，乘积不会溢出 uint64
+    return ((np.outer(sh, _A) + _B) % _PRIME).min(axis=0)
+
+def _bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    # 选 b * r = num_perm，使 LSH 的 S 曲线拐点 (1/b)^(1/r) 最接近阈值
+    best = (num_perm, 1)
+    for r in range(1, num_perm + 1):
+        if num_perm % r:
+            continue
+        b = num_perm // r
+        if abs((1 / b) ** (1 / r) - threshold) < abs((1 / best[0]) ** (1 / best[1]) - threshold):
+            best = (b, r)
+    return best
+
+def dedupe_articles(articles: List[Article], threshold: float = DEDUP_THRESHOLD) -> List[Article]:
+    if not DEDUP_ENABLED or len(articles) < 2:
+        return articles
+
+    sigs = np.stack([minhash(f"{a.title} {a.snippet or ''}") for a in articles])
+    # 没有 [a-z0-9] token 的文本（中日俄文、纯标点）签名全是哨兵值，彼此“完全相同”，不参与合并
+    empty = (sigs == _PRIME).all(axis=1)
+    b, r = _bands(DEDUP_NUM_PERM, threshold)
+
+    parent = list(range(len(articles)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # 每个 bucket 只和桶里第一篇比，保持近线性
+    for band in range(b):
+        heads: dict[bytes, int] = {}
+        rows = sigs[:, band * r:(band + 1) * r]
+        for i in range(len(articles)):
+            if empty[i]:
+                continue
+            key = rows[i].tobytes()
+            j = heads.setdefault(key, i)
+            if j == i or find(i) == find(j):
+                continue
+            if np.mean(sigs[i] == sigs[j]) >= threshold:
+                # 合并到更靠前（更新）的那篇
+                parent[find(i)] = find(j)
+
+    groups: dict[int, List[int]] = {}
+    for i in range(len(articles)):
+        groups.setdefault(find(i), []).append(i)
+
+    result: List[Article] = []
+    for members in sorted(groups.values(), key=lambda m: m[0]):
+        rep = articles[members[0]]
+        if len(members) > 1:
+            alternates = list(rep.alternates)
+            for i in members[1:]:
+                dup = articles[i]
+                alternates.append(AlternateSource(id=dup.id, title=dup.title, source=dup.source, url=dup.url))
+                alternates.extend(dup.alternates)
+            rep = rep.model_copy(update={"alternates": alternates})
+        result.append(rep)
+    return result
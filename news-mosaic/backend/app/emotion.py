@@ -1,12 +1,87 @@
-from nltk.sentiment import SentimentIntensityAnalyzer
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import List
+import numpy as np
+from .settings import EMOTION_CACHE_SIZE, EMOTION_CHUNK_SIZE
+from .workers import run_cpu
 
-_sia = SentimentIntensityAnalyzer()
+# VADER 要读词典，第一次用 / warm() 时再建
+_sia = None
+
+# text hash -> compound，跨请求复用
+_memo: OrderedDict[bytes, float] = OrderedDict()
+_LEVEL_BINS = np.array([0.15, 0.35, 0.60, 0.80])
+_LEVELS = np.array(["CALM", "LOW", "MEDIUM", "HIGH", "EXTREME"])
+
+def _key(text: str) -> bytes:
+    return hashlib.blake2b((text or "").encode("utf-8"), digest_size=16).digest()
+
+def _analyzer():
+    global _sia
+    if _sia is None:
+        from nltk.sentiment import SentimentIntensityAnalyzer
+
+        _sia = SentimentIntensityAnalyzer()
+    return _sia
+
+def warm() -> None:
+    _analyzer()
+
+def compound_scores(texts: List[str]) -> List[float]:
+    # 纯函数，只回传 compound，方便丢给进程池
+    sia = _analyzer()
+    return [float(sia.polarity_scores(t or "")["compound"]) for t in texts]
+
+def _lookup(texts: List[str]) -> tuple[List[bytes], np.ndarray, List[int]]:
+    keys = [_key(t) for t in texts]
+    valence = np.zeros(len(texts))
+    missing: List[int] = []
+    for i, k in enumerate(keys):
+        v = _memo.get(k)
+        if v is None:
+            missing.append(i)
+        else:
+            _memo.move_to_end(k)
+            valence[i] = v
+    return keys, valence, missing
+
+def _remember(keys: List[bytes], valence: np.ndarray, idx: List[int], scores: List[float]) -> None:
+    for i, v in zip(idx, scores):
+        valence[i] = v
+        _memo[keys[i]] = v
+    while len(_memo) > EMOTION_CACHE_SIZE:
+        _memo.popitem(last=False)
+
+def _finish(valence: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    return valence, np.minimum(1.0, np.abs(valence))
+
+def score_batch(texts: List[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Return (valence, intensity) arrays for texts, reusing memoized scores."""
+    keys, valence, missing = _lookup(texts)
+    if missing:
+        _remember(keys, valence, missing, compound_scores([texts[i] for i in missing]))
+    return _finish(valence)
+
+async def score_batch_async(texts: List[str]) -> tuple[np.ndarray, np.ndarray]:
+    # 同 score_batch，但 memo 没命中的部分按 EMOTION_CHUNK_SIZE 分块并发丢进程池
+    keys, valence, missing = _lookup(texts)
+    if missing:
+        size = max(1, EMOTION_CHUNK_SIZE)
+        chunks = [missing[i:i + size] for i in range(0, len(missing), size)]
+        results = await asyncio.gather(
+            *(run_cpu(compound_scores, [texts[i] for i in c], size=len(c)) for c in chunks)
+        )
+        for c, scores in zip(chunks, results):
+            _remember(keys, valence, c, scores)
+    return _finish(valence)
+
+def intensity_levels(intensity: np.ndarray) -> List[str]:
+    return _LEVELS[np.digitize(intensity, _LEVEL_BINS)].tolist()
 
 def emotion_scores(text: str) -> dict:
-    s = _sia.polarity_scores(text or "")
-    valence = float(s["compound"])      # [-1, 1]
-    intensity = min(1.0, abs(valence))  # [0, 1]
-    return {"valence": valence, "intensity": intensity}
+    valence, intensity = score_batch([text])
+    return {"valence": float(valence[0]), "intensity": float(intensity[0])}
 
 def intensity_level(intensity: float) -> str:
     if intensity < 0.15: return "CALM"
@@ -1,9 +1,25 @@
-from typing import List
+from functools import partial
+from typing import Awaitable, Callable, List, Optional
 from .models import Article, Tile, ClusterSummary
-from .settings import GEMINI_API_KEY
-import google.generativeai as genai
+from .settings import (
+    GEMINI_API_KEY,
+    GEMINI_MODEL,
+    GEMINI_API_ENDPOINT,
+    LLM_BATCH_SIZE,
+    LLM_CONCURRENCY,
+    PREFETCH_LLM_CONCURRENCY,
+)
+import asyncio
+import hashlib
 import json
-from .emotion import emotion_scores, intensity_level
+from .emotion import emotion_scores, intensity_level, intensity_levels, score_batch_async
+from .cache import tile_cache, summary_cache
+from .prefetch import background
+from .metrics import stage, llm_call, record_fallback, use_call_counter, charge_llm_calls
+
+# prompt / 输出格式变了就 bump，旧缓存自动失效
+TILE_PROMPT_VERSION = "tiles-v2"
+SUMMARY_PROMPT_VERSION = "summary-v1"
 
 
 def _has_real_gemini_key() -> bool:
@@ -15,11 +31,24 @@ def _has_real_gemini_key() -> bool:
         return False
     return True
 
-def fallback_tile(article: Article) -> Tile:
+def _emotion_text(a: Article) -> str:
+    return f"{a.title}. {a.snippet or ''}"
+
+async def article_emotions(articles: List[Article]) -> List[dict]:
+    # 一次批量打分（memo + 大批量走进程池），level 用向量化分桶
+    with stage("emotion"):
+        valence, intensity = await score_batch_async([_emotion_text(a) for a in articles])
+    levels = intensity_levels(intensity)
+    return [
+        {"valence": float(v), "intensity": float(i), "intensity_level": lvl}
+        for v, i, lvl in zip(valence, intensity, levels)
+    ]
+
+def fallback_tile(article: Article, emo: Optional[dict] = None) -> Tile:
     # 简单用规则：所有 tile 都当 FACT，takeaway 用标题
-    text = f"{article.title}. {article.snippet or ''}"
-    emo = emotion_scores(text)
-    lvl = intensity_level(emo["intensity"])
+    if emo is None:
+        emo = emotion_scores(_emotion_text(article))
+    lvl = emo.get("intensity_level") or intensity_level(emo["intensity"])
 
     return Tile(
         article=article,
@@ -55,71 +84,228 @@ def fallback_cluster_summary(articles: List[Article]) -> ClusterSummary:
         timeline=timeline,
     )
 
-async def classify_tiles(articles: List[Article]) -> List[Tile]:
-    # ✅ 无 key 直接 fallback，不会调用 Gemini
-    if not _has_real_gemini_key():
-        return [fallback_tile(a) for a in articles]
+def _extract_json(text: str) -> str:
+    text = text.strip()
+    # Extract JSON from response (may be wrapped in markdown code blocks)
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0]
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0]
+    return text
 
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel("gemini-2.0-flash")
+# configure + GenerativeModel 只做一次；SDK（grpc/protobuf）也到这时才 import
+_model = None
 
-    tiles: List[Tile] = []
-    for a in articles:
-        payload = {
+def _make_model():
+    global _model
+    if _model is not None:
+        return _model
+    import google.generativeai as genai
+
+    if GEMINI_API_ENDPOINT:
+        genai.configure(
+            api_key=GEMINI_API_KEY,
+            transport="rest",
+            client_options={"api_endpoint": GEMINI_API_ENDPOINT},
+        )
+    else:
+        genai.configure(api_key=GEMINI_API_KEY)
+    _model = genai.GenerativeModel(GEMINI_MODEL)
+    return _model
+
+def warm() -> None:
+    if _has_real_gemini_key():
+        _make_model()
+
+# 全局限制同时在跑的 Gemini batch 数（跨请求共享）
+_llm_sem = asyncio.Semaphore(max(1, LLM_CONCURRENCY))
+
+# 后台预热最多同时占用这么多个 LLM 槽位，剩下的永远留给交互请求
+_bg_sem = asyncio.Semaphore(max(1, PREFETCH_LLM_CONCURRENCY))
+
+async def _call_model(model, prompt: str, op: str) -> str:
+    with llm_call(op):
+        resp = await asyncio.to_thread(model.generate_content, prompt)
+        return resp.text
+
+async def _generate(model, prompt: str, op: str) -> str:
+    # generate_content 是阻塞调用，丢到线程里跑，避免卡住 event loop
+    if background.get():
+        async with _bg_sem, _llm_sem:
+            return await _call_model(model, prompt, op)
+    async with _llm_sem:
+        return await _call_model(model, prompt, op)
+
+def _batch_prompt(batch: List[Article]) -> str:
+    payload = [
+        {
+            "i": i,
             "title": a.title,
             "snippet": a.snippet,
             "source": a.source,
             "published_at": a.published_at,
         }
-        prompt = f"""You label news fragments for a mosaic board. Output strict JSON only.
+        for i, a in enumerate(batch)
+    ]
+    return f"""You label news fragments for a mosaic board. Output strict JSON only.
 
 {json.dumps(payload)}
 
-Respond with JSON containing: type (FACT/ANALYSIS/OPINION/UNVERIFIED), topic_tags (list), one_line_takeaway (string), confidence (0-1 float)."""
-        
+Respond with a JSON array containing one object per fragment, each with: i (the fragment index), type (FACT/ANALYSIS/OPINION/UNVERIFIED), topic_tags (list), one_line_takeaway (string), confidence (0-1 float)."""
+
+def _tile_from_label(a: Article, data: dict, emo: dict) -> Tile:
+    return Tile(
+        article=a,
+        tile_type=data.get("type", "FACT"),
+        topic_tags=data.get("topic_tags", []),
+        one_line_takeaway=data.get("one_line_takeaway", "") or a.title[:120],
+        confidence=float(data.get("confidence", 0.5)),
+        valence=emo["valence"],
+        intensity=emo["intensity"],
+        intensity_level=emo["intensity_level"],
+    )
+
+def _content_digest(a: Article) -> str:
+    # 只按真正发给模型的字段做 key，不信任客户端传来的 id（否则可以用真 id 配假标题污染缓存）
+    raw = json.dumps([a.title, a.snippet, a.source, a.published_at], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _tile_key(a: Article) -> str:
+    return f"{_content_digest(a)}:{GEMINI_MODEL}:{TILE_PROMPT_VERSION}"
+
+def _summary_key(articles: List[Article]) -> str:
+    # summary prompt 只用前 25 篇
+    digests = ",".join(sorted(_content_digest(a) for a in articles[:25]))
+    raw = f"{digests}|{GEMINI_MODEL}|{SUMMARY_PROMPT_VERSION}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+async def _classify_batch(model, batch: List[Article]) -> List[Optional[dict]]:
+    # 返回每篇对应的 label（失败为 None，并按原因计数）
+    try:
+        text = await _generate(model, _batch_prompt(batch), "classify")
+    except Exception:
+        record_fallback("tile", "llm_error", len(batch))
+        return [None] * len(batch)
+    try:
+        data = json.loads(_extract_json(text))
+        if isinstance(data, dict):
+            data = data.get("items", [])
+    except Exception:
+        record_fallback("tile", "parse_error", len(batch))
+        return [None] * len(batch)
+
+    labels: dict[int, dict] = {}
+    for pos, item in enumerate(data if isinstance(data, list) else []):
+        if not isinstance(item, dict):
+            continue
         try:
-            resp = model.generate_content(prompt)
-            text = resp.text.strip()
-            # Extract JSON from response (may be wrapped in markdown code blocks)
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0]
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0]
-            
-            emo = emotion_scores(f"{a.title}. {a.snippet or ''}")
-            lvl = intensity_level(emo["intensity"])
-
-            
-            data = json.loads(text)
-            tiles.append(
-                Tile(
-                    article=a,
-                    tile_type=data.get("type", "FACT"),
-                    topic_tags=data.get("topic_tags", []),
-                    one_line_takeaway=data.get("one_line_takeaway", "") or a.title[:120],
-                    confidence=float(data.get("confidence", 0.5)),
-                    valence=emo["valence"],
-                    intensity=emo["intensity"],
-                    intensity_level=lvl,
-                )
-            )
+            idx = int(item.get("i", pos))
+        except (TypeError, ValueError):
+            continue
+        labels.setdefault(idx, {
+            "type": item.get("type", "FACT"),
+            "topic_tags": item.get("topic_tags", []),
+            "one_line_takeaway": item.get("one_line_takeaway", ""),
+            "confidence": item.get("confidence", 0.5),
+        })
+    record_fallback("tile", "missing_item", sum(1 for i in range(len(batch)) if i not in labels))
+    return [labels.get(i) for i in range(len(batch))]
+
+# deadline 取消外层请求时，已经发出的 LLM 调用照样跑完：
+# 线程真正结束前一直占着 _llm_sem 槽位，结果也照样写缓存，下一次构建直接命中
+# 同一批 key 还在跑时重建直接 join，慢的 Gemini 不会被反复重建堆出更多调用
+# 交互请求不 join 后台（预热）起的任务——那个只能用 _bg_sem 的槽位——而是另起一个交互优先级的（同 ResponseCache._start）
+# key -> (task, 调用计数, 是否后台)
+_detached_tasks: dict[str, tuple[asyncio.Task, list, bool]] = {}
+
+async def _counted(calls: list, make: Callable[[], Awaitable]):
+    # 任务里的 LLM 调用记到自己的计数器上，不记到创建它的那个簇
+    use_call_counter(calls)
+    return await make()
+
+async def _detached(key: str, make: Callable[[], Awaitable]):
+    bg = background.get()
+    entry = _detached_tasks.get(key)
+    if entry is None or (entry[2] and not bg):
+        calls = [0]
+        task = asyncio.create_task(_counted(calls, make))
+        entry = _detached_tasks[key] = (task, calls, bg)
+        task.add_done_callback(
+            lambda t: _detached_tasks.pop(key) if _detached_tasks.get(key, (None,))[0] is t else None
+        )
+    task, calls, _ = entry
+    try:
+        return await asyncio.shield(task)
+    finally:
+        # 等这份结果的簇都算上这些调用（join 的也算）
+        charge_llm_calls(calls[0])
+
+_NEUTRAL_EMO = {"valence": 0.0, "intensity": 0.0, "intensity_level": "CALM"}
+
+async def _label_and_cache(model, articles: List[Article], keys: List[str]) -> List[Optional[dict]]:
+    size = max(1, LLM_BATCH_SIZE)
+    batches = [articles[i:i + size] for i in range(0, len(articles), size)]
+    results = await asyncio.gather(*(_classify_batch(model, b) for b in batches))
+    labels = [label for batch_labels in results for label in batch_labels]
+
+    fresh: dict[str, dict] = {}
+    for a, k, label in zip(articles, keys, labels):
+        if label is None:
+            continue
+        try:
+            _tile_from_label(a, label, _NEUTRAL_EMO)
         except Exception:
-            tiles.append(fallback_tile(a))
+            continue
+        fresh[k] = label
+    if fresh:
+        await asyncio.to_thread(tile_cache.put_many, fresh)
+    return labels
+
+async def classify_tiles(articles: List[Article], model=None) -> List[Tile]:
+    # ✅ 无 key 直接 fallback，不会调用 Gemini（传入 model 时用它，方便接本地 stub）
+    emos = await article_emotions(articles)
+    if model is None and not _has_real_gemini_key():
+        record_fallback("tile", "no_key", len(articles))
+        return [fallback_tile(a, e) for a, e in zip(articles, emos)]
+
+    keys = [_tile_key(a) for a in articles]
+    labels: List[Optional[dict]] = [None] * len(articles)
+    # SQLite 调用放线程里，不占 event loop
+    cached = await asyncio.to_thread(tile_cache.get_many, keys)
+    todo = [i for i, k in enumerate(keys) if k not in cached]
+    for i, k in enumerate(keys):
+        labels[i] = cached.get(k)
 
+    if todo:
+        if model is None:
+            model = _make_model()
+        miss_keys = [keys[i] for i in todo]
+        flight = "tiles:" + hashlib.sha256("|".join(miss_keys).encode("utf-8")).hexdigest()
+        miss = await _detached(
+            flight, partial(_label_and_cache, model, [articles[i] for i in todo], miss_keys)
+        )
+        for i, label in zip(todo, miss):
+            labels[i] = label
+
+    tiles: List[Tile] = []
+    for i, a in enumerate(articles):
+        # 单条解析失败只影响这一条
+        if labels[i] is None:
+            tiles.append(fallback_tile(a, emos[i]))
+            continue
+        try:
+            tiles.append(_tile_from_label(a, labels[i], emos[i]))
+        except Exception:
+            record_fallback("tile", "invalid_item")
+            tiles.append(fallback_tile(a, emos[i]))
     return tiles
 
 async def classify_tiles_fast(articles: List[Article]) -> List[Tile]:
     # 直接返回 fallback，避免 LLM 延迟
-    return [fallback_tile(a) for a in articles]
-
-async def summarize_cluster(articles: List[Article]) -> ClusterSummary:
-    # ✅ 无 key 直接 fallback，不会调用 Gemini
-    if not _has_real_gemini_key():
-        return fallback_cluster_summary(articles)
-
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel("gemini-2.0-flash")
+    emos = await article_emotions(articles)
+    return [fallback_tile(a, emo) for a, emo in zip(articles, emos)]
 
+async def _summarize_and_cache(model, articles: List[Article], key: str) -> Optional[ClusterSummary]:
     payload = {
         "items": [
             {
@@ -139,16 +325,13 @@ async def summarize_cluster(articles: List[Article]) -> ClusterSummary:
 Respond with JSON containing: cluster_title (string), whole_story (object with what_happened, why_it_matters list, what_to_watch list), timeline (list of objects with time and event)."""
 
     try:
-        resp = model.generate_content(prompt)
-        text = resp.text.strip()
-        # Extract JSON from response (may be wrapped in markdown code blocks)
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0]
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0]
-        
-        data = json.loads(text)
-        return ClusterSummary(
+        text = await _generate(model, prompt, "summarize")
+    except Exception:
+        record_fallback("summary", "llm_error")
+        return None
+    try:
+        data = json.loads(_extract_json(text))
+        summary = ClusterSummary(
             cluster_title=data["cluster_title"],
             what_happened=data["whole_story"]["what_happened"],
             why_it_matters=data["whole_story"]["why_it_matters"],
@@ -156,4 +339,24 @@ Respond with JSON containing: cluster_title (string), whole_story (object with w
             timeline=data["timeline"],
         )
     except Exception:
+        record_fallback("summary", "parse_error")
+        return None
+
+    await asyncio.to_thread(summary_cache.put, key, summary.model_dump())
+    return summary
+
+async def summarize_cluster(articles: List[Article], model=None) -> ClusterSummary:
+    # ✅ 无 key 直接 fallback，不会调用 Gemini
+    if model is None and not _has_real_gemini_key():
+        record_fallback("summary", "no_key")
         return fallback_cluster_summary(articles)
+
+    key = _summary_key(articles)
+    cached = await asyncio.to_thread(summary_cache.get, key)
+    if cached is not None:
+        return ClusterSummary(**cached)
+    if model is None:
+        model = _make_model()
+
+    summary = await _detached("summary:" + key, partial(_summarize_and_cache, model, articles, key))
+    return summary if summary is not None else fallback_cluster_summary(articles)
@@ -1,11 +1,86 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache, partial
+from typing import AsyncIterator, Awaitable, Callable, Optional
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from .models import MosaicRequest, Cluster, ClusterLite, ClusterSummaryRequest, ClusterSummary, Tile
-from .news import fetch_news
-from .mosaic import cluster_articles
-from .llm import classify_tiles, classify_tiles_fast, summarize_cluster
+from .news import fetch_news, start_client, close_client
+from .mosaic import cluster_articles_async, incremental, warm as warm_clustering
+from .emotion import warm as warm_emotion
+from .dedup import dedupe_articles
+from .store import article_store
+from .prefetch import PrefetchScheduler, background
+from .metrics import (
+    begin_request,
+    measure_cluster,
+    profiler,
+    record_fallback,
+    render as render_metrics,
+    requests_seconds,
+    server_timing,
+    stage,
+    timed,
+)
+from . import workers
+from .llm import (
+    classify_tiles,
+    classify_tiles_fast,
+    summarize_cluster,
+    fallback_tile,
+    fallback_cluster_summary,
+    warm as warm_llm,
+)
+from .cache import Degraded, tile_cache, summary_cache, mosaic_cache
+from .wire import render_mosaic
+from .settings import (
+    CLUSTER_CONCURRENCY,
+    MOSAIC_DEADLINE_S,
+    PREFETCH_DEADLINE_S,
+    PREFETCH_LLM_CONCURRENCY,
+)
+
+prefetcher = PrefetchScheduler(mosaic_cache)
+
+# 重依赖（sklearn / VADER / Gemini SDK）都是懒加载的；启动后在后台线程里预热，/ready 据此报告
+_warmup: dict = {"components": {}, "seconds": None}
+_WARMERS = {"emotion": warm_emotion, "clustering": warm_clustering, "llm": warm_llm}
+
+async def _warm_up() -> None:
+    t0 = time.perf_counter()
+    for name, warm in _WARMERS.items():
+        _warmup["components"][name] = "loading"
+        try:
+            await asyncio.to_thread(warm)
+            _warmup["components"][name] = "ready"
+        except Exception as e:
+            _warmup["components"][name] = f"error: {e!r}"
+    _warmup["seconds"] = time.perf_counter() - t0
 
-app = FastAPI(title="News Mosaic API")
+def _is_ready() -> bool:
+    parts = _warmup["components"]
+    return len(parts) == len(_WARMERS) and all(v == "ready" for v in parts.values())
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_client()
+    workers.start_pool()
+    compact_task = asyncio.create_task(article_store.compact_forever())
+    prefetcher.start()
+    warm_task = asyncio.create_task(_warm_up())
+    try:
+        yield
+    finally:
+        warm_task.cancel()
+        compact_task.cancel()
+        await prefetcher.stop()
+        workers.shutdown_pool()
+        await close_client()
+
+app = FastAPI(title="News Mosaic API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,38 +90,299 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.post("/mosaic", response_model=list[Cluster])
-async def build_mosaic(req: MosaicRequest):
-    articles = await fetch_news(req.query, req.days, req.max_articles)
-    clustered = cluster_articles(articles)
+@app.middleware("http")
+async def instrument(request: Request, call_next):
+    # 每个请求：各 stage 耗时进 Server-Timing 头，整体耗时进直方图；可选 cProfile
+    timings = begin_request()
+    prof = profiler.start()
+    t0 = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        elapsed = time.perf_counter() - t0
+        profiler.stop(prof, request.url.path, elapsed)
+    path = request.url.path if request.url.path in _route_paths() else "other"
+    requests_seconds.observe(elapsed, path, str(response.status_code))
+    response.headers["Server-Timing"] = server_timing(timings, elapsed)
+    return response
+
+@lru_cache(maxsize=1)
+def _route_paths() -> frozenset:
+    return frozenset(getattr(r, "path", "") for r in app.routes)
+
+# 所有请求共享的簇级 LLM 任务上限；后台预热单独一个小额度，不占交互请求的槽位
+_enrich_sem = asyncio.Semaphore(max(1, CLUSTER_CONCURRENCY))
+_bg_enrich_sem = asyncio.Semaphore(max(1, PREFETCH_LLM_CONCURRENCY))
 
-    result: list[Cluster] = []
+async def _bounded(make: Callable[[], Awaitable]):
+    # 拿到槽位后才创建 coroutine：排队时就被 deadline 取消也不会留下没 await 过的 coroutine
+    async with (_bg_enrich_sem if background.get() else _enrich_sem):
+        return await make()
+
+def _cluster_job(kind: str, items: list) -> Awaitable:
+    if kind == "tiles":
+        return measure_cluster("tiles", timed("classify", classify_tiles(items)))
+    return measure_cluster("summary", timed("summarize", summarize_cluster(items)))
+
+def _fallback(kind: str, items: list, reason: str):
+    if kind == "tiles":
+        record_fallback("tile", reason, len(items))
+        return [fallback_tile(a) for a in items]
+    record_fallback("summary", reason)
+    return fallback_cluster_summary(items)
+
+async def iter_enrichment(
+    clustered: dict[str, list],
+    deadline_s: float = MOSAIC_DEADLINE_S,
+    fallbacks: Optional[list] = None,
+) -> AsyncIterator[tuple[str, str, object]]:
+    # 每个簇的 tiles / summary 各自一个 task，一起并发；谁先完成先 yield (kind, cid, value)
+    # 到截止时间还没完成的取消掉，用 fallback 补上；fallbacks 非 None 时记下 (kind, cid, reason)
+    tasks: dict[asyncio.Task, tuple[str, str]] = {}
     for cid, items in clustered.items():
-        tiles = await classify_tiles(items)
-        summary = await summarize_cluster(items)
-        result.append(Cluster(cluster_id=cid, items=tiles, summary=summary))
+        for kind in ("tiles", "summary"):
+            tasks[asyncio.create_task(_bounded(partial(_cluster_job, kind, items)))] = (kind, cid)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + deadline_s
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=max(0.0, deadline - loop.time()),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                break
+            for t in done:
+                kind, cid = tasks[t]
+                if t.exception() is None:
+                    yield kind, cid, t.result()
+                else:
+                    if fallbacks is not None:
+                        fallbacks.append((kind, cid, "task_error"))
+                    yield kind, cid, _fallback(kind, clustered[cid], "task_error")
+        for t in list(pending):
+            t.cancel()
+            pending.discard(t)
+            kind, cid = tasks[t]
+            if fallbacks is not None:
+                fallbacks.append((kind, cid, "deadline"))
+            yield kind, cid, _fallback(kind, clustered[cid], "deadline")
+    finally:
+        # 流式客户端中途断开时也别留下后台 task
+        for t in pending:
+            t.cancel()
+
+async def enrich_clusters(
+    clustered: dict[str, list], deadline_s: float = MOSAIC_DEADLINE_S
+) -> tuple[list[Cluster], int]:
+    # 返回 (clusters, deadline / task_error fallback 的个数)
+    tiles: dict[str, list] = {}
+    summaries: dict[str, ClusterSummary] = {}
+    fallbacks: list = []
+    async for kind, cid, value in iter_enrichment(clustered, deadline_s, fallbacks):
+        (tiles if kind == "tiles" else summaries)[cid] = value
+    clusters = [
+        Cluster(cluster_id=cid, items=tiles[cid], summary=summaries[cid])
+        for cid in clustered
+    ]
+    return clusters, len(fallbacks)
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+def _request_key(kind: str, req: MosaicRequest) -> tuple:
+    return (kind, _normalize_query(req.query), req.days, req.max_articles)
+
+async def _fetch_and_cluster(req: MosaicRequest) -> tuple[list, dict[str, list]]:
+    with stage("fetch"):
+        articles = await fetch_news(req.query, req.days, req.max_articles)
+    # 转载/改标题的同一篇先合并，后面聚类和 LLM 都少做一份；几千篇时要几百 ms，放线程里跑
+    with stage("dedup"):
+        articles = await asyncio.to_thread(dedupe_articles, articles)
+    with stage("cluster"):
+        clustered = await cluster_articles_async(articles, topic=_normalize_query(req.query))
+    return articles, clustered
+
+async def _build_mosaic(req: MosaicRequest):
+    _, clustered = await _fetch_and_cluster(req)
+
+    deadline_s = PREFETCH_DEADLINE_S if background.get() else MOSAIC_DEADLINE_S
+    result, degraded = await enrich_clusters(clustered, deadline_s)
 
     # 让“最大/最新”的簇排在前面（简单按条数）
     result.sort(key=lambda c: len(c.items), reverse=True)
-    return result
+    # 有簇没赶上 deadline：只短暂缓存，下一次请求重建拿 LLM 结果
+    return Degraded(result) if degraded else result
 
-@app.post("/mosaic-lite", response_model=list[ClusterLite])
-async def build_mosaic_lite(req: MosaicRequest):
-    articles = await fetch_news(req.query, req.days, req.max_articles)
-    clustered = cluster_articles(articles)
+async def _lite_clusters(articles: list, clustered: dict[str, list]) -> list[ClusterLite]:
+    # 所有文章一次性打分，再按簇分回去
+    by_id = {t.article.id: t for t in await classify_tiles_fast(articles)}
 
     result: list[ClusterLite] = []
     for cid, items in clustered.items():
-        tiles = await classify_tiles_fast(items)
+        tiles = [by_id[a.id] for a in items]
         result.append(ClusterLite(cluster_id=cid, items=tiles, summary=None))
 
     result.sort(key=lambda c: len(c.items), reverse=True)
     return result
 
+async def _build_mosaic_lite(req: MosaicRequest) -> list[ClusterLite]:
+    articles, clustered = await _fetch_and_cluster(req)
+    return await _lite_clusters(articles, clustered)
+
+@app.post("/mosaic", response_model=list[Cluster])
+async def build_mosaic(
+    req: MosaicRequest, request: Request, fmt: Optional[str] = Query(None, alias="format")
+):
+    # 默认 schema 不变；?format=compact|msgpack 或对应 Accept 走列式紧凑格式
+    key = _request_key("mosaic", req)
+    build = partial(_build_mosaic, req)
+    prefetcher.record(key, build)
+    with prefetcher.interactive():
+        clusters = await mosaic_cache.get_or_build(key, build)
+    with stage("encode"):
+        return render_mosaic(clusters, request, fmt)
+
+@app.post("/mosaic-lite", response_model=list[ClusterLite])
+async def build_mosaic_lite(
+    req: MosaicRequest, request: Request, fmt: Optional[str] = Query(None, alias="format")
+):
+    key = _request_key("mosaic-lite", req)
+    build = partial(_build_mosaic_lite, req)
+    prefetcher.record(key, build)
+    with prefetcher.interactive():
+        clusters = await mosaic_cache.get_or_build(key, build)
+    with stage("encode"):
+        return render_mosaic(clusters, request, fmt)
+
+def _ndjson(event: dict) -> bytes:
+    return (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
+async def _stream_build(req: MosaicRequest, emit: Callable[[Optional[dict]], None]):
+    # 和 _build_mosaic 产出同样的结果，但边算边把 layout / tiles / summary 事件交给 emit；结束时 emit(None)
+    try:
+        articles, clustered = await _fetch_and_cluster(req)
+        layout = await _lite_clusters(articles, clustered)
+        emit({"type": "layout", "clusters": [c.model_dump(mode="json") for c in layout]})
+        tiles: dict[str, list] = {}
+        summaries: dict[str, ClusterSummary] = {}
+        fallbacks: list = []
+        async for kind, cid, value in iter_enrichment(clustered, fallbacks=fallbacks):
+            if kind == "tiles":
+                tiles[cid] = value
+                data = [t.model_dump(mode="json") for t in value]
+            else:
+                summaries[cid] = value
+                data = value.model_dump(mode="json")
+            emit({"type": kind, "cluster_id": cid, kind: data})
+        result = [
+            Cluster(cluster_id=cid, items=tiles[cid], summary=summaries[cid]) for cid in clustered
+        ]
+        result.sort(key=lambda c: len(c.items), reverse=True)
+        return Degraded(result) if fallbacks else result
+    finally:
+        emit(None)
+
+class _Broadcast:
+    """Events a streaming build has emitted so far, fanned out to every stream watching it."""
+
+    def __init__(self):
+        self.events: list[Optional[dict]] = []
+        self.queues: list[asyncio.Queue] = []
+
+    def emit(self, event: Optional[dict]) -> None:
+        self.events.append(event)
+        for q in self.queues:
+            q.put_nowait(event)
+
+    def subscribe(self) -> asyncio.Queue:
+        # 后来的流先重放已经发过的事件，再接着收新的
+        q: asyncio.Queue = asyncio.Queue()
+        for event in self.events:
+            q.put_nowait(event)
+        self.queues.append(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        if q in self.queues:
+            self.queues.remove(q)
+
+# 流式构建的 in-flight task -> 它的事件广播；同 key 的流 join 进来也能逐步收到事件
+_broadcasts: dict[asyncio.Task, _Broadcast] = {}
+
+@app.post("/mosaic-stream")
+async def stream_mosaic(req: MosaicRequest):
+    # NDJSON：先推 lite 布局（聚类完就有），再按完成顺序推每个簇的 tiles / summary
+    # 和 /mosaic 共用同一个缓存条目和 in-flight 构建：新鲜的直接一次推完；否则算完写回，预热也对它生效
+    key = _request_key("mosaic", req)
+    prefetcher.record(key, partial(_build_mosaic, req))
+
+    async def events():
+        bc = _Broadcast()
+        with prefetcher.interactive():
+            cached, task, owner = mosaic_cache.claim(key, partial(_stream_build, req, bc.emit))
+            if owner:
+                _broadcasts[task] = bc
+                task.add_done_callback(lambda t: _broadcasts.pop(t, None))
+            elif task is not None:
+                bc = _broadcasts.get(task)
+            if cached is not None or bc is None:
+                # 已有新鲜结果，或 /mosaic 正在算同一个 key（没有事件可转发）：等它算完一次推完
+                if cached is None:
+                    cached = await asyncio.shield(task)
+                yield _ndjson({"type": "layout", "clusters": [c.model_dump(mode="json") for c in cached]})
+                yield _ndjson({"type": "done"})
+                return
+            # 构建本身是缓存里登记的 in-flight task（客户端断开也会算完写缓存），这里只转发事件
+            queue = bc.subscribe()
+            try:
+                while (event := await queue.get()) is not None:
+                    yield _ndjson(event)
+            finally:
+                bc.unsubscribe(queue)
+            await asyncio.shield(task)
+            yield _ndjson({"type": "done"})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 @app.post("/cluster-summary", response_model=ClusterSummary)
 async def build_cluster_summary(req: ClusterSummaryRequest):
-    return await summarize_cluster(req.items)
+    return await timed("summarize", summarize_cluster(req.items))
 
 @app.post("/cluster-tiles", response_model=list[Tile])
 async def build_cluster_tiles(req: ClusterSummaryRequest):
-    return await classify_tiles(req.items)
+    return await timed("classify", classify_tiles(req.items))
+
+def _stats() -> dict:
+    return {
+        "tile_cache": tile_cache.stats(),
+        "summary_cache": summary_cache.stats(),
+        "mosaic_cache": mosaic_cache.stats(),
+        "workers": workers.stats(),
+        "clustering": incremental.stats(),
+        "article_store": article_store.stats(),
+        "prefetch": prefetcher.stats(),
+        "warmup": {**_warmup, "ready": _is_ready(), "workers_ready": workers.ready()},
+    }
+
+@app.get("/stats")
+async def stats():
+    # 各 stats() 要拿 SQLite 的锁（压缩期间会一直占着），放线程里等，不卡 event loop
+    return await asyncio.to_thread(_stats)
+
+@app.get("/ready")
+async def ready():
+    # 负载均衡 / k8s readinessProbe 用：模型和进程池都热了才 200
+    workers_ready = workers.ready()
+    ok = _is_ready() and workers_ready
+    body = {"ready": ok, "workers_ready": workers_ready, **_warmup}
+    return JSONResponse(body, status_code=200 if ok else 503)
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(
+        render_metrics(await asyncio.to_thread(_stats)), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
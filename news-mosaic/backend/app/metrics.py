@@ -0,0 +1,240 @@
+import bisect
+import contextlib
+import cProfile
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from .settings import PROFILE_REQUESTS, PROFILE_SLOW_MS, PROFILE_DIR
+
+_DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+
+
+def _fmt_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def get(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for lv, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labels, lv)} {v}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = _DEFAULT_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        # label values -> (per-bucket counts, sum, count)
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            s = self._series.setdefault(label_values, [[0] * len(self.buckets), 0.0, 0])
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for lv, (counts, total, n) in sorted(self._series.items()):
+                acc = 0
+                for le, c in zip(self.buckets, counts):
+                    acc += c
+                    bucket = _fmt_labels(self.labels, lv, 'le="%s"' % le)
+                    lines.append(f"{self.name}_bucket{bucket} {acc}")
+                inf = _fmt_labels(self.labels, lv, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{inf} {n}")
+                lines.append(f"{self.name}_sum{_fmt_labels(self.labels, lv)} {total}")
+                lines.append(f"{self.name}_count{_fmt_labels(self.labels, lv)} {n}")
+        return lines
+
+
+stage_seconds = Histogram(
+    "newsmosaic_stage_seconds", "Time spent in each pipeline stage.", ("stage",)
+)
+llm_calls = Counter(
+    "newsmosaic_llm_calls_total", "Gemini calls by operation and outcome.", ("op", "outcome")
+)
+llm_seconds = Histogram("newsmosaic_llm_seconds", "Gemini call latency.", ("op",))
+cluster_llm_calls = Histogram(
+    "newsmosaic_cluster_llm_calls", "Gemini calls made per cluster enrichment task.", ("kind",), _COUNT_BUCKETS
+)
+cluster_seconds = Histogram(
+    "newsmosaic_cluster_enrich_seconds", "Per-cluster enrichment latency.", ("kind",)
+)
+fallbacks = Counter(
+    "newsmosaic_fallback_total", "Rule-based fallbacks used instead of LLM output.", ("kind", "reason")
+)
+requests_seconds = Histogram(
+    "newsmosaic_request_seconds", "HTTP request latency (time to response start).", ("path", "status")
+)
+profiles_dumped = Counter("newsmosaic_profiles_dumped_total", "Slow-request profiles written to disk.")
+
+_REGISTRY = [
+    stage_seconds, llm_calls, llm_seconds, cluster_llm_calls, cluster_seconds,
+    fallbacks, requests_seconds, profiles_dumped,
+]
+
+# 当前请求的 stage 耗时（给 Server-Timing 用）和当前簇任务的 LLM 调用次数
+_timings: ContextVar[Optional[dict]] = ContextVar("timings", default=None)
+_cluster_calls: ContextVar[Optional[list]] = ContextVar("cluster_calls", default=None)
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        stage_seconds.observe(elapsed, name)
+        timings = _timings.get()
+        if timings is not None:
+            total, n = timings.get(name, (0.0, 0))
+            timings[name] = (total + elapsed, n + 1)
+
+
+async def timed(name: str, coro):
+    with stage(name):
+        return await coro
+
+
+def record_fallback(kind: str, reason: str, n: int = 1) -> None:
+    if n:
+        fallbacks.inc(kind, reason, amount=n)
+
+
+@contextlib.contextmanager
+def llm_call(op: str) -> Iterator[None]:
+    calls = _cluster_calls.get()
+    if calls is not None:
+        calls[0] += 1
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        llm_calls.inc(op, "error")
+        raise
+    else:
+        llm_calls.inc(op, "ok")
+    finally:
+        llm_seconds.observe(time.perf_counter() - t0, op)
+
+
+def use_call_counter(calls: list) -> None:
+    # 当前 context 之后的 LLM 调用记到 calls[0]（llm 的 detached 任务用）
+    _cluster_calls.set(calls)
+
+
+def charge_llm_calls(n: int) -> None:
+    calls = _cluster_calls.get()
+    if calls is not None:
+        calls[0] += n
+
+
+async def measure_cluster(kind: str, coro):
+    # 在簇任务自己的 context 里计数（create_task 会复制 context，互不干扰）
+    _cluster_calls.set([0])
+    t0 = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        cluster_seconds.observe(time.perf_counter() - t0, kind)
+        cluster_llm_calls.observe(_cluster_calls.get()[0], kind)
+
+
+def begin_request() -> dict:
+    timings: dict = {}
+    _timings.set(timings)
+    return timings
+
+
+def server_timing(timings: dict, total_s: float) -> str:
+    parts = [
+        f'{name};dur={total * 1000:.1f};desc="x{n}"' if n > 1 else f"{name};dur={total * 1000:.1f}"
+        for name, (total, n) in timings.items()
+    ]
+    parts.append(f"total;dur={total_s * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def _sanitize(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def render(gauges: Optional[dict] = None) -> str:
+    lines: list[str] = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    # /stats 里的数值一并作为 gauge 导出
+    for section, values in (gauges or {}).items():
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"newsmosaic_{_sanitize(section)}_{_sanitize(key)}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class RequestProfiler:
+    """Opt-in cProfile hook; dumps a .prof for requests slower than PROFILE_SLOW_MS.
+
+    cProfile hooks the whole thread, so concurrent requests on the same loop show up
+    in the profile too; only one request is profiled at a time.
+    """
+
+    def __init__(self, enabled: bool = PROFILE_REQUESTS, slow_ms: float = PROFILE_SLOW_MS, out_dir: str = PROFILE_DIR):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.out_dir = out_dir
+        self._active = False
+
+    def start(self) -> Optional[cProfile.Profile]:
+        if not self.enabled or self._active:
+            return None
+        self._active = True
+        prof = cProfile.Profile()
+        prof.enable()
+        return prof
+
+    def stop(self, prof: Optional[cProfile.Profile], path: str, elapsed_s: float) -> None:
+        if prof is None:
+            return
+        prof.disable()
+        self._active = False
+        if elapsed_s * 1000 < self.slow_ms:
+            return
+        os.makedirs(self.out_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{_sanitize(path.strip('/') or 'root')}-{int(elapsed_s * 1000)}ms.prof"
+        # 用 snakeviz / flameprof / py-spy 等工具把 .prof 画成火焰图
+        prof.dump_stats(os.path.join(self.out_dir, name))
+        profiles_dumped.inc()
+
+
+profiler = RequestProfiler()
@@ -3,6 +3,12 @@ from typing import List, Optional, Literal
 
 TileType = Literal["FACT", "ANALYSIS", "OPINION", "UNVERIFIED"]
 
+class AlternateSource(BaseModel):
+    id: str
+    title: str
+    source: str = ""
+    url: HttpUrl
+
 class Article(BaseModel):
     id: str
     title: str
@@ -10,6 +16,7 @@ class Article(BaseModel):
     source: str = ""
     published_at: str = ""
     url: HttpUrl
+    alternates: List[AlternateSource] = []  # 被近似去重合并掉的其它来源
 
 class MosaicRequest(BaseModel):
     query: str
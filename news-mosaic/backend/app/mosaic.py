@@ -1,21 +1,43 @@
-from typing import List
+from typing import Iterable, List, Optional
+import asyncio
 import math
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
 from .models import Article
+from .settings import (
+    CLUSTER_MODE,
+    CLUSTER_MAX_K,
+    CLUSTER_NEW_SIM,
+    CLUSTER_STALE_S,
+    CLUSTER_HASH_FEATURES,
+    CLUSTER_MAX_TOPICS,
+)
+from .workers import run_cpu
 
 def choose_k(n: int) -> int:
-    return min(8, max(3, round(n / 10)))
+    # 去重后 n 可能小于 3，k 不能超过样本数
+    return max(1, min(n, 8, max(3, round(n / 10))))
+
+def _texts(articles: List[Article]) -> List[str]:
+    return [(a.title + " " + (a.snippet or "")) for a in articles]
+
+def cluster_labels(texts: List[str], k: int) -> List[int]:
+    # 纯函数：texts 进、label 数组出，可以直接丢给进程池
+    if k <= 1 or len(texts) <= 1:
+        return [0] * len(texts)
+    # sklearn import 很慢（~1s），放到第一次用 / warm() 时再加载
+    from sklearn.cluster import KMeans
+    from sklearn.feature_extraction.text import TfidfVectorizer
 
-def cluster_articles(articles: List[Article]) -> dict[str, List[Article]]:
-    texts = [(a.title + " " + (a.snippet or "")) for a in articles]
     vec = TfidfVectorizer(stop_words="english", max_features=5000)
     X = vec.fit_transform(texts)
 
-    k = choose_k(len(articles))
     km = KMeans(n_clusters=k, n_init="auto", random_state=42)
-    labels = km.fit_predict(X)
+    return km.fit_predict(X).tolist()
 
+def _group(articles: List[Article], labels: List[int]) -> dict[str, List[Article]]:
     clusters: dict[str, List[Article]] = {}
     for art, lab in zip(articles, labels):
         cid = f"c{lab}"
@@ -26,3 +48,190 @@ def cluster_articles(articles: List[Article]) -> dict[str, List[Article]]:
         clusters[cid].sort(key=lambda a: a.published_at or "", reverse=True)
 
     return clusters
+
+def choose_k_adaptive(n: int) -> int:
+    # 初始 k 随规模增长（不再卡死在 8），之后新话题再按需长出新簇；最多用一半上限，给新簇留空间
+    return max(1, min(CLUSTER_MAX_K // 2, n, round(math.sqrt(n / 2))))
+
+class _TopicState:
+    def __init__(self):
+        self.centroids = np.zeros((0, CLUSTER_HASH_FEATURES), dtype=np.float32)
+        self.counts = np.zeros(0, dtype=np.float64)
+        self.last_used = np.zeros(0, dtype=np.float64)
+        self.cluster_ids: List[int] = []
+        self.assignments: OrderedDict[str, int] = OrderedDict()
+        self.next_id = 0
+
+    def add_centroid(self, vec: np.ndarray, count: float, now: float) -> int:
+        cid = self.next_id
+        self.next_id += 1
+        self.centroids = np.vstack([self.centroids, vec.astype(np.float32)[None, :]])
+        self.counts = np.append(self.counts, count)
+        self.last_used = np.append(self.last_used, now)
+        self.cluster_ids.append(cid)
+        return len(self.cluster_ids) - 1
+
+    def touch(self, cluster_ids: Iterable[int], now: float) -> None:
+        pos = {cid: i for i, cid in enumerate(self.cluster_ids)}
+        for cid in set(cluster_ids):
+            i = pos.get(cid)
+            if i is not None:
+                self.last_used[i] = now
+
+    def retire_stale(self, cutoff: float) -> int:
+        # 退役的质心不再接收新文章；已经分给它的文章照旧用原来的簇 id
+        keep = self.last_used >= cutoff
+        retired = int((~keep).sum())
+        if retired:
+            self.centroids = self.centroids[keep]
+            self.counts = self.counts[keep]
+            self.last_used = self.last_used[keep]
+            self.cluster_ids = [cid for cid, k in zip(self.cluster_ids, keep) if k]
+        return retired
+
+class IncrementalClusterer:
+    """Hashing vectorizer + online k-means; centroids and ids persist per topic."""
+
+    def __init__(self, max_topics: int = CLUSTER_MAX_TOPICS, max_assignments: int = 5000):
+        self.max_topics = max_topics
+        self.max_assignments = max_assignments
+        self._hasher = None
+        self._topics: OrderedDict[str, _TopicState] = OrderedDict()
+        self._lock = threading.Lock()
+        self.retired = 0
+
+    def hasher(self):
+        if self._hasher is None:
+            from sklearn.feature_extraction.text import HashingVectorizer
+
+            self._hasher = HashingVectorizer(
+                n_features=CLUSTER_HASH_FEATURES,
+                stop_words="english",
+                alternate_sign=False,
+                norm="l2",
+            )
+        return self._hasher
+
+    def cluster(self, topic: str, articles: List[Article]) -> dict[str, List[Article]]:
+        with self._lock:
+            state = self._topics.get(topic)
+            if state is None:
+                state = self._topics[topic] = _TopicState()
+                while len(self._topics) > self.max_topics:
+                    self._topics.popitem(last=False)
+            self._topics.move_to_end(topic)
+            now = time.monotonic()
+
+            new = [a for a in dict((a.id, a) for a in articles).values() if a.id not in state.assignments]
+            if new:
+                if len(state.cluster_ids) >= CLUSTER_MAX_K:
+                    # 簇满了：先退役过时的质心，新话题才有地方开新簇，而不是硬塞进最近的老簇
+                    self.retired += state.retire_stale(now - CLUSTER_STALE_S)
+                X = self.hasher().transform(_texts(new))
+                if not state.cluster_ids:
+                    self._seed(state, new, X, now)
+                else:
+                    self._assign(state, new, X, now)
+
+            # 旧文章沿用之前的簇 id，新文章无需 refit
+            labels = []
+            for a in articles:
+                state.assignments.move_to_end(a.id)
+                labels.append(state.assignments[a.id])
+            # 还出现在结果里的簇不算过时
+            state.touch(labels, now)
+            while len(state.assignments) > self.max_assignments:
+                state.assignments.popitem(last=False)
+        return _group(articles, labels)
+
+    def _seed(self, state: _TopicState, new: List[Article], X, now: float) -> None:
+        k = choose_k_adaptive(len(new))
+        if k == 1:
+            labels = np.zeros(len(new), dtype=int)
+        else:
+            from sklearn.cluster import MiniBatchKMeans
+
+            km = MiniBatchKMeans(n_clusters=k, n_init=3, random_state=42, batch_size=1024)
+            labels = km.fit_predict(X)
+        for j in range(k):
+            rows = np.flatnonzero(labels == j)
+            if len(rows) == 0:
+                continue
+            idx = state.add_centroid(_normalize(np.asarray(X[rows].mean(axis=0)).ravel()), len(rows), now)
+            for r in rows:
+                state.assignments[new[r].id] = state.cluster_ids[idx]
+
+    def _assign(self, state: _TopicState, new: List[Article], X, now: float) -> None:
+        sims = np.asarray(X @ state.centroids.T)
+        best = sims.argmax(axis=1)
+        best_sim = sims[np.arange(len(new)), best]
+        norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+
+        k0 = len(state.cluster_ids)
+        sums = np.zeros((k0, state.centroids.shape[1]), dtype=np.float64)
+        added = np.zeros(k0)
+        for r, a in enumerate(new):
+            idx = int(best[r])
+            if best_sim[r] < CLUSTER_NEW_SIM and norms[r] > 0:
+                # 离所有老质心都远：先看本批新开的簇，再考虑开新簇（leader 式），满了就归最近的
+                x = X[r].toarray().ravel()
+                if len(state.cluster_ids) > k0:
+                    fresh = state.centroids[k0:] @ x
+                    j = int(fresh.argmax())
+                    if fresh[j] >= CLUSTER_NEW_SIM:
+                        state.counts[k0 + j] += 1
+                        state.assignments[a.id] = state.cluster_ids[k0 + j]
+                        continue
+                if len(state.cluster_ids) < CLUSTER_MAX_K:
+                    idx = state.add_centroid(x, 1, now)
+                    state.assignments[a.id] = state.cluster_ids[idx]
+                    continue
+            sums[idx] += X[r].toarray().ravel()
+            added[idx] += 1
+            state.assignments[a.id] = state.cluster_ids[idx]
+
+        # 在线更新：c <- (c * n + sum(x)) / (n + m)
+        for idx in np.flatnonzero(added):
+            n = state.counts[idx]
+            c = (state.centroids[idx] * n + sums[idx]) / (n + added[idx])
+            state.centroids[idx] = _normalize(c)
+            state.counts[idx] = n + added[idx]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": CLUSTER_MODE,
+                "topics": len(self._topics),
+                "clusters": {t: len(s.cluster_ids) for t, s in self._topics.items()},
+                "retired": self.retired,
+            }
+
+def _normalize(v: np.ndarray) -> np.ndarray:
+    n = np.linalg.norm(v)
+    return (v / n if n > 0 else v).astype(np.float32)
+
+incremental = IncrementalClusterer()
+
+def warm() -> None:
+    # 预先 import sklearn 并跑一次小聚类，第一个真实请求不再付加载成本
+    cluster_labels(["warm up", "warm start", "cold start"], 2)
+    if CLUSTER_MODE == "incremental":
+        incremental.hasher()
+
+def cluster_articles(articles: List[Article], topic: Optional[str] = None) -> dict[str, List[Article]]:
+    if CLUSTER_MODE == "incremental":
+        return incremental.cluster(topic or "", articles)
+    labels = cluster_labels(_texts(articles), choose_k(len(articles)))
+    return _group(articles, labels)
+
+async def cluster_articles_async(
+    articles: List[Article], topic: Optional[str] = None
+) -> dict[str, List[Article]]:
+    if CLUSTER_MODE == "incremental":
+        # 状态在本进程里，放线程跑即可
+        return await asyncio.to_thread(incremental.cluster, topic or "", articles)
+    # 大输入走进程池，不阻塞 event loop；小输入 inline
+    labels = await run_cpu(
+        cluster_labels, _texts(articles), choose_k(len(articles)), size=len(articles)
+    )
+    return _group(articles, labels)
@@ -1,8 +1,28 @@
+import asyncio
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 import httpx
 import hashlib
 from .models import Article
-from .settings import NEWS_API_KEY
+from .settings import (
+    NEWS_API_KEY,
+    NEWS_API_URL,
+    NEWS_PAGE_SIZE,
+    NEWS_MAX_CONNECTIONS,
+    NEWS_MAX_RETRIES,
+    NEWS_BACKOFF_S,
+    NEWS_MAX_RETRY_AFTER_S,
+    STORE_ENABLED,
+    STORE_MIN_REFRESH_S,
+    STORE_INDEX_LAG_S,
+)
 from .sample_data import SAMPLE_ARTICLES
+from .store import article_store, iso_utc, query_terms
+
+# 由 FastAPI lifespan 创建/关闭的长连接 client（keep-alive 复用）
+_client: Optional[httpx.AsyncClient] = None
 
 def _make_id(title: str, source: str, published_at: str) -> str:
     raw = f"{title}|{source}|{published_at}".encode("utf-8")
@@ -16,26 +36,61 @@ def _has_real_newsapi_key() -> bool:
         return False
     return True
 
-async def fetch_news(query: str, days: int, max_articles: int) -> list[Article]:
-    # ✅ 没有真实 key：直接用 mock 数据
-    if not _has_real_newsapi_key():
-        return SAMPLE_ARTICLES[:max_articles]
+async def start_client() -> None:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=20,
+            limits=httpx.Limits(
+                max_connections=NEWS_MAX_CONNECTIONS,
+                max_keepalive_connections=NEWS_MAX_CONNECTIONS,
+            ),
+        )
 
-    # 否则走 NewsAPI
-    url = "https://newsapi.org/v2/everything"
-    params = {
-        "q": query,
-        "pageSize": min(max_articles, 100),
-        "sortBy": "publishedAt",
-        "language": "en",
-        "apiKey": NEWS_API_KEY,
-    }
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def _get_client() -> httpx.AsyncClient:
+    # 不经过 lifespan（脚本/测试直接调用）时懒创建
+    if _client is None:
+        await start_client()
+    return _client
+
+def _is_retryable(status: int) -> bool:
+    return status == 429 or status >= 500
 
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.get(url, params=params)
-        r.raise_for_status()
-        data = r.json()
+def _retry_delay(attempt: int, resp: Optional[httpx.Response]) -> Optional[float]:
+    # None：服务端要求等太久，不值得重试
+    if resp is not None:
+        retry_after = resp.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            delay = float(retry_after)
+            return delay if delay <= NEWS_MAX_RETRY_AFTER_S else None
+    return NEWS_BACKOFF_S * (2 ** attempt) * (0.5 + random.random())
 
+async def _get_page(client: httpx.AsyncClient, params: dict, page: int) -> dict:
+    for attempt in range(NEWS_MAX_RETRIES + 1):
+        resp: Optional[httpx.Response] = None
+        try:
+            resp = await client.get(NEWS_API_URL, params={**params, "page": page})
+            if not _is_retryable(resp.status_code):
+                resp.raise_for_status()
+                return resp.json()
+            if attempt == NEWS_MAX_RETRIES:
+                resp.raise_for_status()
+        except httpx.TransportError:
+            if attempt == NEWS_MAX_RETRIES:
+                raise
+        delay = _retry_delay(attempt, resp)
+        if delay is None:
+            resp.raise_for_status()
+        await asyncio.sleep(delay)
+    raise RuntimeError("unreachable")
+
+def _parse_articles(data: dict) -> list[Article]:
     articles: list[Article] = []
     for a in data.get("articles", []):
         title = a.get("title") or ""
@@ -57,7 +112,40 @@ async def fetch_news(query: str, days: int, max_articles: int) -> list[Article]:
                 url=link,
             )
         )
+    return articles
+
+async def _fetch_remote(query: str, since: str, max_articles: int) -> list[Article]:
+    page_size = min(max_articles, NEWS_PAGE_SIZE)
+    params = {
+        "q": query,
+        "from": since,
+        "pageSize": page_size,
+        "sortBy": "publishedAt",
+        "language": "en",
+        "apiKey": NEWS_API_KEY,
+    }
+    client = await _get_client()
+
+    # 第一页先拿 totalResults，再并发拉剩下的页
+    first = await _get_page(client, params, 1)
+    pages: dict[int, list[Article]] = {1: _parse_articles(first)}
+    total = int(first.get("totalResults") or 0)
+    n_pages = min(math.ceil(max_articles / page_size), math.ceil(total / page_size))
+
+    async def _fetch(page: int) -> tuple[int, dict]:
+        return page, await _get_page(client, params, page)
+
+    for fut in asyncio.as_completed([_fetch(p) for p in range(2, n_pages + 1)]):
+        # 后续页失败（比如套餐只允许前 100 条）不影响已经拿到的结果
+        try:
+            page, data = await fut
+        except (httpx.HTTPError, ValueError):
+            continue
+        pages[page] = _parse_articles(data)
+
+    return [art for page in sorted(pages) for art in pages[page]][:max_articles]
 
+def _dedupe_titles(articles: list[Article]) -> list[Article]:
     # 简单去重（按 title）
     seen = set()
     deduped = []
@@ -67,5 +155,62 @@ async def fetch_news(query: str, days: int, max_articles: int) -> list[Article]:
             continue
         seen.add(key)
         deduped.append(art)
+    return deduped
+
+def _covered_from(since: str, fetched: list[Article], max_articles: int) -> str:
+    # 没拉满说明窗口内都拿到了；拉满了只能确认最旧那篇之后是完整的
+    if len(fetched) < max_articles:
+        return since
+    return min((a.published_at for a in fetched if a.published_at), default=since)
+
+def _record_coverage(terms: list[str], start: str, end: str) -> None:
+    # 拉满了且最旧一篇比 end 还新：可信区间是空的，不记
+    if start < end:
+        article_store.record_coverage(terms, start, end)
+
+async def fetch_news(query: str, days: int, max_articles: int) -> list[Article]:
+    # ✅ 没有真实 key：直接用 mock 数据
+    if not _has_real_newsapi_key():
+        return SAMPLE_ARTICLES[:max_articles]
+
+    now = datetime.now(timezone.utc)
+    since = iso_utc(now - timedelta(days=days))
+    terms = query_terms(query) if STORE_ENABLED else None
+    if terms is None:
+        return _dedupe_titles(await _fetch_remote(query, since, max_articles))[:max_articles]
+
+    # 先看本地库：已经覆盖过的时间段不再请求，只补最新的缺口
+    # 覆盖记录只记到 now - STORE_INDEX_LAG_S：更近的文章可能还没进 NewsAPI 索引，补缺口时从那里重拉（按 id 去重）
+    # SQLite 调用都放线程里跑（store 自带锁），不阻塞 event loop
+    covered_until = iso_utc(now - timedelta(seconds=STORE_INDEX_LAG_S))
+    cov = await asyncio.to_thread(article_store.coverage, terms, since)
+    if cov is not None:
+        start, end, exact = cov
+        fetched_at = datetime.strptime(end, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+        age = (now - fetched_at).total_seconds() - STORE_INDEX_LAG_S
+        if exact and start <= since:
+            # terms 完全一致、窗口也覆盖到了：只补 end 之后的缺口，覆盖记录才能延长
+            if age >= STORE_MIN_REFRESH_S:
+                fresh = await _fetch_remote(query, end, max_articles)
+                article_store.remote_fetches += 1
+                await asyncio.to_thread(article_store.add, fresh, terms)
+                if len(fresh) >= max_articles:
+                    start = _covered_from(end, fresh, max_articles)
+                await asyncio.to_thread(_record_coverage, terms, start, covered_until)
+            else:
+                article_store.local_hits += 1
+            return _dedupe_titles(await asyncio.to_thread(article_store.search, terms, since, max_articles))
+        if not exact and age < STORE_MIN_REFRESH_S:
+            # 子集覆盖不算真的覆盖（远端还会匹配正文）：本地已经凑够 max_articles 才直接用，否则整段拉一次
+            local = await asyncio.to_thread(article_store.search, terms, max(start, since), max_articles)
+            if len(local) >= max_articles:
+                article_store.local_hits += 1
+                return _dedupe_titles(local)
 
-    return deduped[:max_articles]
+    fetched = await _fetch_remote(query, since, max_articles)
+    article_store.remote_fetches += 1
+    await asyncio.to_thread(article_store.add, fetched, terms)
+    await asyncio.to_thread(
+        _record_coverage, terms, _covered_from(since, fetched, max_articles), covered_until
+    )
+    return _dedupe_titles(await asyncio.to_thread(article_store.search, terms, since, max_articles))
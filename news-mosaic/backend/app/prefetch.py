@@ -0,0 +1,155 @@
+import asyncio
+import contextlib
+import math
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from .cache import DegradedBuild, ResponseCache
+from .settings import (
+    PREFETCH_ENABLED,
+    PREFETCH_INTERVAL_S,
+    PREFETCH_TOP_N,
+    PREFETCH_HALF_LIFE_S,
+    PREFETCH_MIN_SCORE,
+    PREFETCH_REFRESH_AT,
+    PREFETCH_MAX_INTERACTIVE,
+)
+
+# 预热任务里为 True；llm 等据此把后台工作限制在少量并发槽位里
+background: ContextVar[bool] = ContextVar("background", default=False)
+
+
+class PrefetchScheduler:
+    """Tracks query popularity and keeps the top-N mosaics warm in a ResponseCache."""
+
+    def __init__(
+        self,
+        cache: ResponseCache,
+        interval_s: float = PREFETCH_INTERVAL_S,
+        top_n: int = PREFETCH_TOP_N,
+        half_life_s: float = PREFETCH_HALF_LIFE_S,
+        min_score: float = PREFETCH_MIN_SCORE,
+        max_tracked: int = 1000,
+    ):
+        self.cache = cache
+        self.interval_s = interval_s
+        self.top_n = top_n
+        self.half_life_s = half_life_s
+        self.min_score = min_score
+        self.max_tracked = max_tracked
+        self.interactive_inflight = 0
+        self.runs = 0
+        self.builds = 0
+        self.failures = 0
+        self.degraded = 0
+        self.skipped_busy = 0
+        self.hits = 0
+        self.requests = 0
+        # key -> (score, last_seen, build)
+        self._scores: dict[Hashable, tuple[float, float, Callable[[], Awaitable[Any]]]] = {}
+        self._prefetched: set[Hashable] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def _decayed(self, score: float, last_seen: float, now: float) -> float:
+        return score * math.pow(0.5, (now - last_seen) / self.half_life_s)
+
+    def record(self, key: Hashable, build: Callable[[], Awaitable[Any]]) -> None:
+        # 交互请求进来时记一次热度；顺便统计是否命中了预热过的结果
+        now = time.monotonic()
+        score, last_seen, _ = self._scores.get(key, (0.0, now, build))
+        self._scores[key] = (self._decayed(score, last_seen, now) + 1.0, now, build)
+        if len(self._scores) > self.max_tracked:
+            coldest = min(self._scores, key=lambda k: self._decayed(*self._scores[k][:2], now))
+            del self._scores[coldest]
+            self._prefetched.discard(coldest)
+
+        self.requests += 1
+        age = self.cache.age(key)
+        if (
+            key in self._prefetched
+            and age is not None
+            and age < self.cache.ttl_s
+            and not self.cache.degraded(key)
+        ):
+            self.hits += 1
+
+    @contextlib.contextmanager
+    def interactive(self):
+        self.interactive_inflight += 1
+        try:
+            yield
+        finally:
+            self.interactive_inflight -= 1
+
+    def top(self) -> list[Hashable]:
+        now = time.monotonic()
+        scores = {k: self._decayed(*v[:2], now) for k, v in self._scores.items()}
+        ranked = sorted((k for k, s in scores.items() if s >= self.min_score), key=scores.get, reverse=True)
+        return ranked[: self.top_n]
+
+    async def run_once(self) -> None:
+        self.runs += 1
+        token = background.set(True)
+        try:
+            for key in self.top():
+                # 有交互请求在跑就让路，下一轮再说
+                if self.interactive_inflight > PREFETCH_MAX_INTERACTIVE:
+                    self.skipped_busy += 1
+                    return
+                age = self.cache.age(key)
+                fresh = age is not None and age < self.cache.ttl_s * PREFETCH_REFRESH_AT
+                if fresh and not self.cache.degraded(key):
+                    continue
+                try:
+                    await self.cache.refresh(key, self._scores[key][2])
+                except DegradedBuild:
+                    # 带 deadline fallback 的结果不缓存、也不算预热过
+                    self.degraded += 1
+                    self._prefetched.discard(key)
+                    continue
+                except Exception:
+                    self.failures += 1
+                    continue
+                self.builds += 1
+                self._prefetched.add(key)
+        finally:
+            background.reset(token)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                await self.run_once()
+            except Exception:
+                self.failures += 1
+
+    def start(self) -> None:
+        if PREFETCH_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict:
+        ages = [a for a in (self.cache.age(k) for k in self._prefetched) if a is not None]
+        return {
+            "enabled": PREFETCH_ENABLED,
+            "tracked": len(self._scores),
+            "warm": len(ages),
+            "runs": self.runs,
+            "builds": self.builds,
+            "failures": self.failures,
+            "degraded": self.degraded,
+            "skipped_busy": self.skipped_busy,
+            "interactive_inflight": self.interactive_inflight,
+            "hits": self.hits,
+            "requests": self.requests,
+            "hit_rate": (self.hits / self.requests) if self.requests else 0.0,
+            "staleness_max_s": max(ages, default=0.0),
+            "staleness_avg_s": (sum(ages) / len(ages)) if ages else 0.0,
+        }
@@ -5,3 +5,90 @@ load_dotenv()
 
 NEWS_API_KEY = os.getenv("NEWS_API_KEY", "")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+
+# Gemini tile 分类：每个 prompt 打包多少篇文章、同时跑多少个 batch
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "10"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+
+# /mosaic 簇级 enrichment：全局并发上限 + 单请求截止时间（秒）
+CLUSTER_CONCURRENCY = int(os.getenv("CLUSTER_CONCURRENCY", "8"))
+MOSAIC_DEADLINE_S = float(os.getenv("MOSAIC_DEADLINE_S", "25"))
+
+# 本地持久化缓存（SQLite）：tile 标签 + 簇摘要
+CACHE_PATH = os.getenv("CACHE_PATH", "news_mosaic_cache.sqlite3")
+CACHE_TTL_S = float(os.getenv("CACHE_TTL_S", str(7 * 24 * 3600)))
+TILE_CACHE_MAX_ENTRIES = int(os.getenv("TILE_CACHE_MAX_ENTRIES", "50000"))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "5000"))
+# 每写多少次做一次过期清理（超出上限时会立即淘汰）
+CACHE_EVICT_EVERY = int(os.getenv("CACHE_EVICT_EVERY", "100"))
+
+# /mosaic、/mosaic-lite 进程内响应缓存：新鲜期、过期后仍可先返回旧结果的窗口、条数上限
+MOSAIC_CACHE_TTL_S = float(os.getenv("MOSAIC_CACHE_TTL_S", "300"))
+MOSAIC_CACHE_STALE_S = float(os.getenv("MOSAIC_CACHE_STALE_S", "1800"))
+MOSAIC_CACHE_MAX_ENTRIES = int(os.getenv("MOSAIC_CACHE_MAX_ENTRIES", "256"))
+# 带 deadline / task_error fallback 的结果只缓存这么久，且不做 stale 返回
+MOSAIC_CACHE_DEGRADED_TTL_S = float(os.getenv("MOSAIC_CACHE_DEGRADED_TTL_S", "15"))
+
+# NewsAPI 抓取：长连接池、分页、429/5xx 重试
+NEWS_API_URL = os.getenv("NEWS_API_URL", "https://newsapi.org/v2/everything")
+NEWS_PAGE_SIZE = int(os.getenv("NEWS_PAGE_SIZE", "100"))
+NEWS_MAX_CONNECTIONS = int(os.getenv("NEWS_MAX_CONNECTIONS", "20"))
+NEWS_MAX_RETRIES = int(os.getenv("NEWS_MAX_RETRIES", "3"))
+NEWS_BACKOFF_S = float(os.getenv("NEWS_BACKOFF_S", "0.5"))
+# Retry-After 超过这个秒数（比如日配额用完）就不等了，直接失败
+NEWS_MAX_RETRY_AFTER_S = float(os.getenv("NEWS_MAX_RETRY_AFTER_S", "10"))
+
+# CPU 密集任务（聚类、大批量 VADER）用的进程池；小输入直接在当前进程算
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", "2"))
+CPU_INLINE_THRESHOLD = int(os.getenv("CPU_INLINE_THRESHOLD", "200"))
+
+# 聚类模式："tfidf"（每次重新 fit）或 "incremental"（hashing + 在线 k-means，按 topic 保留质心）
+CLUSTER_MODE = os.getenv("CLUSTER_MODE", "tfidf")
+CLUSTER_MAX_K = int(os.getenv("CLUSTER_MAX_K", "24"))
+CLUSTER_NEW_SIM = float(os.getenv("CLUSTER_NEW_SIM", "0.12"))
+# 质心这么久没有文章归入（也没出现在请求结果里）就算过时，簇满时先退役它们再开新簇
+CLUSTER_STALE_S = float(os.getenv("CLUSTER_STALE_S", "3600"))
+CLUSTER_HASH_FEATURES = int(os.getenv("CLUSTER_HASH_FEATURES", str(2 ** 14)))
+CLUSTER_MAX_TOPICS = int(os.getenv("CLUSTER_MAX_TOPICS", "64"))
+
+# 近似去重（MinHash-LSH，title+snippet）：估计 Jaccard ≥ 阈值视为同一篇
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") == "1"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.6"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "64"))
+
+# VADER 批量打分：按文本 hash 的 memo 缓存大小、进程池分块大小
+EMOTION_CACHE_SIZE = int(os.getenv("EMOTION_CACHE_SIZE", "50000"))
+EMOTION_CHUNK_SIZE = int(os.getenv("EMOTION_CHUNK_SIZE", "500"))
+
+# 本地文章库（SQLite）：倒排索引 + published_at 索引，先查本地再补网络缺口
+STORE_ENABLED = os.getenv("STORE_ENABLED", "1") == "1"
+STORE_PATH = os.getenv("STORE_PATH", "news_mosaic_articles.sqlite3")
+STORE_RETENTION_DAYS = float(os.getenv("STORE_RETENTION_DAYS", "30"))
+STORE_MAX_ARTICLES = int(os.getenv("STORE_MAX_ARTICLES", "200000"))
+STORE_MIN_REFRESH_S = float(os.getenv("STORE_MIN_REFRESH_S", "300"))
+# NewsAPI 按 publishedAt 过滤但入库有延迟（Developer 套餐约 24h）：最近这段不算已覆盖，下次补缺口时重拉
+STORE_INDEX_LAG_S = float(os.getenv("STORE_INDEX_LAG_S", str(24 * 3600)))
+# 后台压缩（清过期/超量文章 + vacuum）的周期，启动时先跑一次
+STORE_COMPACT_INTERVAL_S = float(os.getenv("STORE_COMPACT_INTERVAL_S", "3600"))
+
+# 热门查询后台预热：按衰减热度取 top-N，定期重建；只在交互请求少时跑，LLM 只占少量并发
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") == "1"
+PREFETCH_INTERVAL_S = float(os.getenv("PREFETCH_INTERVAL_S", "60"))
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "10"))
+PREFETCH_HALF_LIFE_S = float(os.getenv("PREFETCH_HALF_LIFE_S", "3600"))
+# 衰减热度低于这个值的不预热：默认 1.5 = 一个半衰期内至少被请求过两次，只来过一次的查询不重建
+PREFETCH_MIN_SCORE = float(os.getenv("PREFETCH_MIN_SCORE", "1.5"))
+PREFETCH_REFRESH_AT = float(os.getenv("PREFETCH_REFRESH_AT", "0.8"))
+PREFETCH_MAX_INTERACTIVE = int(os.getenv("PREFETCH_MAX_INTERACTIVE", "0"))
+PREFETCH_LLM_CONCURRENCY = int(os.getenv("PREFETCH_LLM_CONCURRENCY", "1"))
+# 预热只有一个槽位、簇任务串行跑，用单独的（更长的）截止时间
+PREFETCH_DEADLINE_S = float(os.getenv("PREFETCH_DEADLINE_S", "180"))
+
+# 可选的慢请求 profiling：PROFILE_REQUESTS=1 时用 cProfile 跑请求，超过阈值的 dump 成 .prof
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0") == "1"
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "2000"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# 覆盖 Gemini REST endpoint（例如指向本地 stub："http://127.0.0.1:9000"）
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "")
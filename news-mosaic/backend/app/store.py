@@ -0,0 +1,185 @@
+import asyncio
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+
+from .models import Article
+from .settings import (
+    STORE_PATH,
+    STORE_RETENTION_DAYS,
+    STORE_MAX_ARTICLES,
+    STORE_COMPACT_INTERVAL_S,
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# 带 NewsAPI 高级语法（引号、+/-、括号、AND/OR/NOT）的查询没法用倒排索引模拟，直接走网络
+_OPERATORS = re.compile(r'["+\-()]|\b(AND|OR|NOT)\b')
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in", "is",
+    "it", "its", "of", "on", "or", "that", "the", "to", "was", "were", "will", "with",
+}
+
+def iso_utc(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall((text or "").lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+def query_terms(query: str) -> Optional[List[str]]:
+    if _OPERATORS.search(query or ""):
+        return None
+    terms = sorted(set(tokenize(query)))
+    return terms or None
+
+
+class ArticleStore:
+    """Persistent article store with an inverted term index and a published_at index.
+
+    Coverage rows remember which (terms, time range) have already been fetched from
+    NewsAPI, so a query whose terms are a superset of a covered query can be served
+    locally (NewsAPI terms are ANDed, so its results are a subset).
+    """
+
+    def __init__(self, path: str, retention_days: float, max_articles: int):
+        self.retention_days = retention_days
+        self.max_articles = max_articles
+        self.local_hits = 0
+        self.remote_fetches = 0
+        self.compactions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS articles (
+                id TEXT PRIMARY KEY, title TEXT NOT NULL, snippet TEXT NOT NULL,
+                source TEXT NOT NULL, published_at TEXT NOT NULL, url TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS articles_published ON articles(published_at);
+            CREATE TABLE IF NOT EXISTS terms (
+                term TEXT NOT NULL, article_id TEXT NOT NULL,
+                PRIMARY KEY (term, article_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS terms_article ON terms(article_id);
+            CREATE TABLE IF NOT EXISTS coverage (
+                terms TEXT NOT NULL, start TEXT NOT NULL, end TEXT NOT NULL, fetched_at REAL NOT NULL
+            );
+            """
+        )
+
+    def add(self, articles: Iterable[Article], terms: List[str]) -> None:
+        # 除了标题/摘要里的词，也把拉到它的查询词记进索引（NewsAPI 还会匹配正文）
+        now = time.time()
+        rows, postings = [], []
+        for a in articles:
+            rows.append((a.id, a.title, a.snippet, a.source, a.published_at, str(a.url), now))
+            for t in set(tokenize(f"{a.title} {a.snippet}")) | set(terms):
+                postings.append((t, a.id))
+        if not rows:
+            return
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._db.executemany("INSERT OR IGNORE INTO terms VALUES (?, ?)", postings)
+            self._db.execute("COMMIT")
+
+    def search(self, terms: List[str], since: str, limit: int) -> List[Article]:
+        marks = ",".join("?" * len(terms))
+        sql = (
+            "SELECT id, title, snippet, source, published_at, url FROM articles "
+            "WHERE published_at >= ? AND id IN ("
+            f"SELECT article_id FROM terms WHERE term IN ({marks}) "
+            "GROUP BY article_id HAVING COUNT(*) = ?) "
+            "ORDER BY published_at DESC LIMIT ?"
+        )
+        with self._lock:
+            rows = self._db.execute(
+                sql, (since, *terms, len(terms), limit)
+            ).fetchall()
+        return [
+            Article(id=r[0], title=r[1], snippet=r[2], source=r[3], published_at=r[4], url=r[5])
+            for r in rows
+        ]
+
+    def coverage(self, terms: List[str], since: str) -> Optional[tuple[str, str, bool]]:
+        # 找 terms 是当前查询子集、且覆盖到 since 之后的记录，返回 (start, end, exact)
+        # exact 表示 terms 完全相同：只有这种才算真的覆盖了（远端还会匹配正文，本地只索引了标题/摘要）
+        # 完全相同的优先，其次 end 最新，再其次 start 最早
+        wanted = set(terms)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT terms, start, end FROM coverage WHERE end >= ?", (since,)
+            ).fetchall()
+        candidates = sorted(
+            (start, end, set(t.split()) == wanted) for t, start, end in rows if set(t.split()) <= wanted
+        )
+        if not candidates:
+            return None
+        return max(candidates, key=lambda c: (c[2], c[1]))
+
+    def record_coverage(self, terms: List[str], start: str, end: str) -> None:
+        key = " ".join(terms)
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM coverage WHERE terms = ? AND start >= ? AND end <= ?", (key, start, end)
+            )
+            self._db.execute(
+                "INSERT INTO coverage VALUES (?, ?, ?, ?)", (key, start, end, time.time())
+            )
+
+    def compact(self) -> None:
+        with self._lock:
+            self._compact()
+        self.compactions += 1
+
+    async def compact_forever(self, interval_s: float = STORE_COMPACT_INTERVAL_S) -> None:
+        # lifespan 里起的后台 task：压缩在线程里跑，不阻塞请求
+        while True:
+            try:
+                await asyncio.to_thread(self.compact)
+            except Exception:
+                pass
+            await asyncio.sleep(interval_s)
+
+    def _compact(self) -> None:
+        # 过期文章、超出上限的最旧文章、孤儿倒排项、旧覆盖记录一并清掉，然后回收空间
+        cutoff = iso_utc(datetime.now(timezone.utc) - timedelta(days=self.retention_days))
+        self._db.execute("BEGIN")
+        self._db.execute("DELETE FROM articles WHERE published_at < ?", (cutoff,))
+        (size,) = self._db.execute("SELECT COUNT(*) FROM articles").fetchone()
+        if size > self.max_articles:
+            self._db.execute(
+                "DELETE FROM articles WHERE id IN "
+                "(SELECT id FROM articles ORDER BY published_at ASC LIMIT ?)",
+                (size - self.max_articles,),
+            )
+        self._db.execute("DELETE FROM terms WHERE article_id NOT IN (SELECT id FROM articles)")
+        self._db.execute("DELETE FROM coverage WHERE end < ?", (cutoff,))
+        # cutoff 之前的文章已经删了，覆盖记录也不能再声称覆盖那一段
+        self._db.execute("UPDATE coverage SET start = ? WHERE start < ?", (cutoff, cutoff))
+        self._db.execute("COMMIT")
+        self._db.execute("PRAGMA incremental_vacuum")
+
+    def stats(self) -> dict:
+        with self._lock:
+            (articles,) = self._db.execute("SELECT COUNT(*) FROM articles").fetchone()
+            (postings,) = self._db.execute("SELECT COUNT(*) FROM terms").fetchone()
+            (coverage,) = self._db.execute("SELECT COUNT(*) FROM coverage").fetchone()
+        return {
+            "articles": articles,
+            "postings": postings,
+            "coverage_ranges": coverage,
+            "local_hits": self.local_hits,
+            "remote_fetches": self.remote_fetches,
+            "compactions": self.compactions,
+        }
+
+
+article_store = ArticleStore(STORE_PATH, STORE_RETENTION_DAYS, STORE_MAX_ARTICLES)
@@ -0,0 +1,109 @@
+import json
+from typing import Optional, Sequence, Union
+
+from fastapi import HTTPException, Request, Response
+
+from .models import Cluster, ClusterLite
+
+# orjson / msgpack 都是可选的：没装就退回标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+COMPACT_JSON = "application/vnd.news-mosaic.compact+json"
+COMPACT_MSGPACK = "application/vnd.news-mosaic.compact+msgpack"
+COMPACT_VERSION = 1
+
+_ARTICLE_FIELDS = ("id", "title", "snippet", "source", "published_at", "url", "alternates")
+_TILE_FIELDS = (
+    "tile_type", "topic_tags", "one_line_takeaway", "confidence",
+    "valence", "intensity", "intensity_level",
+)
+
+
+def dumps(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def compact_mosaic(clusters: Sequence[Union[Cluster, ClusterLite]]) -> dict:
+    """Columnar article/tile tables; clusters reference tiles by index, tiles reference articles by index.
+
+    Works straight off the already-validated models, so nothing is re-validated.
+    """
+    articles = {f: [] for f in _ARTICLE_FIELDS}
+    tiles = {"article": [], **{f: [] for f in _TILE_FIELDS}}
+    index: dict[str, int] = {}
+    out_clusters = []
+    for c in clusters:
+        refs = []
+        for t in c.items:
+            a = t.article
+            i = index.get(a.id)
+            if i is None:
+                i = index[a.id] = len(index)
+                articles["id"].append(a.id)
+                articles["title"].append(a.title)
+                articles["snippet"].append(a.snippet)
+                articles["source"].append(a.source)
+                articles["published_at"].append(a.published_at)
+                articles["url"].append(str(a.url))
+                articles["alternates"].append(
+                    [[x.id, x.title, x.source, str(x.url)] for x in a.alternates]
+                )
+            refs.append(len(tiles["article"]))
+            tiles["article"].append(i)
+            for f in _TILE_FIELDS:
+                tiles[f].append(getattr(t, f))
+        out_clusters.append({
+            "cluster_id": c.cluster_id,
+            "tiles": refs,
+            "summary": c.summary.model_dump() if c.summary is not None else None,
+        })
+    return {
+        "v": COMPACT_VERSION,
+        "articles": articles,
+        "tiles": tiles,
+        "clusters": out_clusters,
+    }
+
+
+def _wire_format(request: Request, fmt: Optional[str]) -> Optional[str]:
+    # ?format= 优先，其次看 Accept；都没有就是默认 schema
+    if fmt:
+        fmt = fmt.lower()
+        return fmt if fmt in ("compact", "msgpack") else None
+    accept = request.headers.get("accept", "")
+    if COMPACT_MSGPACK in accept or "application/msgpack" in accept or "application/x-msgpack" in accept:
+        return "msgpack"
+    if COMPACT_JSON in accept:
+        return "compact"
+    return None
+
+
+def render_mosaic(
+    clusters: Sequence[Union[Cluster, ClusterLite]], request: Request, fmt: Optional[str] = None
+) -> Response:
+    """Encode a mosaic directly into a Response, bypassing response_model re-validation."""
+    wire = _wire_format(request, fmt)
+    headers = {"Vary": "Accept"}
+    if wire is None:
+        return Response(
+            dumps([c.model_dump(mode="json") for c in clusters]),
+            media_type="application/json",
+            headers=headers,
+        )
+    if wire == "msgpack" and msgpack is None:
+        # 明确要了 msgpack 就别悄悄换成 JSON
+        raise HTTPException(406, "msgpack is not installed on this server; use format=compact")
+    payload = compact_mosaic(clusters)
+    if wire == "msgpack":
+        return Response(msgpack.packb(payload), media_type=COMPACT_MSGPACK, headers=headers)
+    return Response(dumps(payload), media_type=COMPACT_JSON, headers=headers)
@@ -0,0 +1,107 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from .settings import CPU_WORKERS, CPU_INLINE_THRESHOLD
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pings: list[Future] = []
+_stats = {
+    "submitted": 0,
+    "inline": 0,
+    "threaded": 0,
+    "pending": 0,
+    "completed": 0,
+    "failed": 0,
+    "restarts": 0,
+    "total_s": 0.0,
+    "max_s": 0.0,
+    "last_s": 0.0,
+}
+
+def _warm() -> None:
+    # worker 启动时先把 sklearn / nltk VADER 加载好
+    from . import mosaic, emotion
+
+    mosaic.warm()
+    emotion.warm()
+
+def _ping() -> bool:
+    return True
+
+def start_pool() -> None:
+    global _pool
+    if _pool is not None or CPU_WORKERS <= 0:
+        return
+    # spawn：不把父进程的 event loop / sqlite 连接 fork 进 worker
+    _pool = ProcessPoolExecutor(
+        max_workers=CPU_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_warm,
+    )
+    _pings[:] = [_pool.submit(_ping) for _ in range(CPU_WORKERS)]
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _pings.clear()
+
+def _restart() -> None:
+    _stats["restarts"] += 1
+    shutdown_pool()
+    start_pool()
+
+def ready() -> bool:
+    # 启动时每个 worker 的 ping 都成功回来了 = initializer 已跑完（失败/取消的 ping 不算）
+    # 不再发新的 ping：繁忙时它要排在 CPU 任务后面，会把正常干活的实例判成 not ready
+    # 只读：进程池坏了由 run_cpu 碰到 BrokenProcessPool 时重建，新池的 warm ping 回来之前算 not ready
+    return all(f.done() and not f.cancelled() and f.exception() is None for f in _pings)
+
+async def run_cpu(fn: Callable[..., Any], *args: Any, size: int) -> Any:
+    # fn 必须是模块级函数（要 pickle 给 worker），参数/返回值尽量是紧凑的 list
+    if size < CPU_INLINE_THRESHOLD:
+        _stats["inline"] += 1
+        return fn(*args)
+    if _pool is None:
+        # 没有进程池（CPU_WORKERS=0 / 还没启动）：大任务至少放到线程里，不卡 event loop
+        _stats["threaded"] += 1
+        return await asyncio.to_thread(fn, *args)
+
+    _stats["submitted"] += 1
+    _stats["pending"] += 1
+    pool = _pool
+    t0 = time.perf_counter()
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        # worker 被杀/崩了：重建进程池（并发失败的请求只重建一次），这次先在线程里算
+        _stats["failed"] += 1
+        if _pool is pool:
+            _restart()
+        _stats["threaded"] += 1
+        return await asyncio.to_thread(fn, *args)
+    except Exception:
+        _stats["failed"] += 1
+        raise
+    finally:
+        _stats["pending"] -= 1
+    elapsed = time.perf_counter() - t0
+    _stats["completed"] += 1
+    _stats["total_s"] += elapsed
+    _stats["last_s"] = elapsed
+    _stats["max_s"] = max(_stats["max_s"], elapsed)
+    return result
+
+def stats() -> dict:
+    done = _stats["completed"]
+    return {
+        "workers": CPU_WORKERS if _pool is not None else 0,
+        "inline_threshold": CPU_INLINE_THRESHOLD,
+        **_stats,
+        "avg_s": (_stats["total_s"] / done) if done else 0.0,
+    }
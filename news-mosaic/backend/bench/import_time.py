@@ -0,0 +1,99 @@
+"""Import-time benchmark for `app.main` (worker cold start).
+
+Runs `python -X importtime -c "import app.main"` in fresh interpreters, reports the
+median cumulative import time and the slowest modules, and fails if a heavy
+dependency that is supposed to load lazily got imported eagerly again:
+
+    python -m bench.import_time
+    python -m bench.import_time --save-baseline      # writes bench/import_baseline.json
+    python -m bench.import_time --tolerance 0.3      # exits 1 on regression
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+DEFAULT_BASELINE = Path(__file__).with_name("import_baseline.json")
+BACKEND = Path(__file__).resolve().parent.parent
+# 这些必须懒加载（lifespan 里预热），import app.main 时不应出现
+LAZY_MODULES = ("sklearn", "google.generativeai", "nltk.sentiment")
+
+_PROBE = (
+    "import sys, app.main; "
+    "print(','.join(m for m in {lazy!r} if m in sys.modules))"
+)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--module", default="app.main")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--top", type=int, default=15, help="slowest modules to print")
+    p.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    p.add_argument("--save-baseline", action="store_true")
+    p.add_argument("--tolerance", type=float, default=0.3, help="allowed relative regression")
+    return p.parse_args(argv)
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(BACKEND), env.get("PYTHONPATH")]))
+    env.setdefault("NLTK_DATA", str(BACKEND / "nltk_data"))
+    return env
+
+
+def importtime(module: str) -> dict[str, int]:
+    """Module -> cumulative import time in microseconds, from one fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND, env=_env(), capture_output=True, text=True, check=True,
+    )
+    out: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if cumulative.isdigit():
+            out[name] = int(cumulative)
+    return out
+
+
+def eager_lazy_modules() -> list[str]:
+    proc = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(lazy=LAZY_MODULES)],
+        cwd=BACKEND, env=_env(), capture_output=True, text=True, check=True,
+    )
+    return [m for m in proc.stdout.strip().split(",") if m]
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    importtime(args.module)  # 先跑一次，让 .pyc 都生成好，别把编译时间算进去
+    runs = [importtime(args.module) for _ in range(max(1, args.runs))]
+    total_ms = statistics.median(r.get(args.module, 0) for r in runs) / 1000
+    slowest = sorted(runs[-1].items(), key=lambda kv: kv[1], reverse=True)[: args.top]
+
+    print(f"import {args.module}: median {total_ms:.1f}ms over {len(runs)} runs")
+    for name, us in slowest:
+        print(f"  {us / 1000:>9.1f}ms  {name}")
+
+    failures = [f"{m} is imported eagerly" for m in eager_lazy_modules()]
+    result = {"module": args.module, "median_ms": total_ms}
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(result, indent=2))
+        print(f"baseline written to {args.baseline}")
+    elif args.baseline.exists():
+        base = json.loads(args.baseline.read_text())
+        if base.get("module") == args.module and total_ms > base["median_ms"] * (1 + args.tolerance):
+            failures.append(f"import time {total_ms:.1f}ms vs baseline {base['median_ms']:.1f}ms")
+
+    for line in failures:
+        print(f"REGRESSION {line}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
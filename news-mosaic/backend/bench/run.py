@@ -0,0 +1,278 @@
+"""Offline benchmark for the mosaic pipeline.
+
+Generates synthetic corpora, serves them from a local stub NewsAPI, answers Gemini
+calls from a local stub server, and measures the individual stages and the HTTP
+endpoints under concurrent load. Run from news-mosaic/backend:
+
+    python -m bench.run --sizes 100,1000,10000
+    python -m bench.run --sizes 100,1000 --save-baseline        # writes bench/baseline.json
+    python -m bench.run --sizes 100,1000 --tolerance 0.25       # exits 1 on regression
+
+Everything is cold by default (response/label caches and the article store are
+disabled) so numbers reflect real work; pass --warm to keep caches on.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from .corpus import TOPICS, generate
+from .stubs import StubGemini, StubNewsAPI
+
+BACKEND = Path(__file__).resolve().parents[1]
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--sizes", default="100,1000,5000", help="comma-separated corpus sizes (100..50000)")
+    p.add_argument("--stages", default="dedup,cluster_articles,emotion_scores,classify_tiles")
+    p.add_argument("--endpoints", default="/mosaic-lite,/mosaic")
+    p.add_argument("--repeat", type=int, default=3, help="runs per stage measurement")
+    p.add_argument("--requests", type=int, default=20, help="requests per endpoint per size")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--max-articles", type=int, default=500, help="max_articles sent to endpoints")
+    p.add_argument("--classify-limit", type=int, default=1000, help="articles per classify_tiles run")
+    p.add_argument("--dup-rate", type=float, default=0.15)
+    p.add_argument("--news-latency-ms", type=float, default=30)
+    p.add_argument("--news-error-rate", type=float, default=0.0)
+    p.add_argument("--llm-latency-ms", type=float, default=80)
+    p.add_argument("--llm-error-rate", type=float, default=0.0)
+    p.add_argument("--warm", action="store_true", help="keep caches and the article store enabled")
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    p.add_argument("--save-baseline", action="store_true")
+    p.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    p.add_argument("--json", type=Path, help="also write results to this file")
+    return p.parse_args(argv)
+
+
+def configure_env(args: argparse.Namespace, news: StubNewsAPI, gemini: StubGemini, tmp: str) -> None:
+    # app.settings 在 import 时读环境变量，所以必须在 import app 之前设置
+    os.environ.update({
+        "NEWS_API_KEY": "bench",
+        "NEWS_API_URL": news.endpoint,
+        "NEWS_BACKOFF_S": "0.05",
+        "GEMINI_API_KEY": "bench",
+        "GEMINI_API_ENDPOINT": gemini.url,
+        "CACHE_PATH": os.path.join(tmp, "cache.sqlite3"),
+        "STORE_PATH": os.path.join(tmp, "articles.sqlite3"),
+        "PREFETCH_ENABLED": "0",
+        "PROFILE_REQUESTS": "0",
+    })
+    # 用仓库里带的 VADER 词典，不要求全局装过 nltk_data
+    os.environ.setdefault("NLTK_DATA", str(BACKEND / "nltk_data"))
+    if not args.warm:
+        os.environ.update({
+            "CACHE_TTL_S": "0",
+            "MOSAIC_CACHE_TTL_S": "0",
+            "MOSAIC_CACHE_STALE_S": "0",
+            "STORE_ENABLED": "0",
+        })
+
+
+def peak_rss_mb() -> float:
+    # Linux 上 ru_maxrss 单位是 KB，macOS 上是字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _pct(sorted_ms: list[float], q: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    idx = min(len(sorted_ms) - 1, max(0, round(q * (len(sorted_ms) - 1))))
+    return sorted_ms[idx]
+
+
+def summarize(latencies_s: list[float], wall_s: float, errors: int) -> dict:
+    ms = sorted(x * 1000 for x in latencies_s)
+    return {
+        "n": len(ms),
+        "errors": errors,
+        "throughput": (len(ms) / wall_s) if wall_s > 0 else 0.0,
+        "p50_ms": _pct(ms, 0.50),
+        "p95_ms": _pct(ms, 0.95),
+        "p99_ms": _pct(ms, 0.99),
+        "mean_ms": statistics.fmean(ms) if ms else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def drive(call: Callable[[int], Awaitable[None]], n: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(max(1, concurrency))
+    latencies: list[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                await call(i)
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return summarize(latencies, time.perf_counter() - t0, errors)
+
+
+async def bench_stages(args, size: int, raw: list[dict]) -> dict[str, dict]:
+    from app import emotion, llm, mosaic, news
+    from app.dedup import dedupe_articles
+    from app.mosaic import cluster_articles
+
+    # sklearn / VADER 是懒加载的，先预热，别把 import 时间算进第一个 stage
+    mosaic.warm()
+    emotion.warm()
+    llm.warm()
+
+    articles = news._parse_articles({"articles": raw})
+    texts = [f"{a.title}. {a.snippet}" for a in articles]
+    subset = articles[: args.classify_limit]
+
+    async def run_dedup(_):
+        dedupe_articles(articles)
+
+    async def run_cluster(_):
+        cluster_articles(articles)
+
+    async def run_emotion(_):
+        emotion._memo.clear()  # 冷启动打分，不吃 memo
+        emotion.score_batch(texts)
+
+    async def run_classify(_):
+        await llm.classify_tiles(subset)
+
+    stages = {
+        "dedup": run_dedup,
+        "cluster_articles": run_cluster,
+        "emotion_scores": run_emotion,
+        "classify_tiles": run_classify,
+    }
+    results = {}
+    for name in filter(None, args.stages.split(",")):
+        # key 里始终带语料规模；classify 额外带实际处理的条数（受 --classify-limit 限制）
+        key = f"stage:{name}:n={size}"
+        if name == "classify_tiles":
+            key += f":limit={len(subset)}"
+        results[key] = await drive(stages[name], args.repeat, 1)
+    return results
+
+
+async def wait_ready(client, timeout_s: float = 120.0) -> None:
+    # 进程池 spawn + 模型预热完成前的请求测的是启动成本，不是稳态延迟
+    deadline = time.perf_counter() + timeout_s
+    while True:
+        r = await client.get("/ready")
+        if r.status_code == 200:
+            return
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"app not ready after {timeout_s:.0f}s: {r.text}")
+        await asyncio.sleep(0.1)
+
+
+async def bench_endpoints(args, size: int) -> dict[str, dict]:
+    import httpx
+    from app.main import app
+
+    queries = list(TOPICS)
+    max_articles = min(size, args.max_articles)
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            await wait_ready(client)
+            for path in filter(None, args.endpoints.split(",")):
+                async def call(i: int, path=path) -> None:
+                    r = await client.post(path, json={
+                        "query": queries[i % len(queries)], "days": 7, "max_articles": max_articles,
+                    })
+                    r.raise_for_status()
+
+                key = f"endpoint:{path}:n={size}:max={max_articles}:c={args.concurrency}"
+                results[key] = await drive(call, args.requests, args.concurrency)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b:
+            continue
+        if b["p95_ms"] > 0 and r["p95_ms"] > b["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {r['p95_ms']:.1f}ms vs baseline {b['p95_ms']:.1f}ms")
+        if b["throughput"] > 0 and r["throughput"] < b["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {r['throughput']:.2f}/s vs baseline {b['throughput']:.2f}/s")
+        if b.get("errors", 0) == 0 and r["errors"] > 0:
+            regressions.append(f"{name}: {r['errors']} errors (baseline had none)")
+    return regressions
+
+
+def print_table(results: dict) -> None:
+    header = f"{'benchmark':<62} {'n':>4} {'err':>4} {'ops/s':>9} {'p50ms':>9} {'p95ms':>9} {'p99ms':>9} {'rssMB':>7}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(
+            f"{name:<62} {r['n']:>4} {r['errors']:>4} {r['throughput']:>9.2f} "
+            f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['peak_rss_mb']:>7.0f}"
+        )
+
+
+async def main_async(args) -> dict:
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    news = StubNewsAPI([], args.news_latency_ms, args.news_error_rate).start()
+    gemini = StubGemini(args.llm_latency_ms, args.llm_error_rate).start()
+    results: dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(args, news, gemini, tmp)
+        try:
+            for size in sizes:
+                raw = generate(size, seed=args.seed, dup_rate=args.dup_rate)
+                news.set_articles(raw)
+                results.update(await bench_stages(args, size, raw))
+                results.update(await bench_endpoints(args, size))
+        finally:
+            news.stop()
+            gemini.stop()
+    results["_stubs"] = {
+        "news_requests": news.requests, "news_errors": news.errors,
+        "llm_requests": gemini.requests, "llm_errors": gemini.errors,
+    }
+    return results
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(main_async(args))
+    stubs = results.pop("_stubs")
+    print_table(results)
+    print(f"stubs: {stubs}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2, sort_keys=True))
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if args.baseline.exists():
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
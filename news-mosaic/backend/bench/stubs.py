@@ -0,0 +1,167 @@
+"""Local stub NewsAPI and Gemini REST servers with configurable latency and error rates."""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+class _StubServer:
+    def __init__(self, handler_cls, latency_ms: float, error_rate: float, seed: int):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        handler = type(handler_cls.__name__, (handler_cls,), {"stub": self})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _admit(self) -> bool:
+        # 模拟延迟；按 error_rate 返回 False 表示这次要失败
+        with self._lock:
+            self.requests += 1
+            fail = self.rng.random() < self.error_rate
+            jitter = self.rng.uniform(0.5, 1.5)
+            if fail:
+                self.errors += 1
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms * jitter / 1000)
+        return not fail
+
+
+class _Handler(BaseHTTPRequestHandler):
+    stub: _StubServer
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _NewsHandler(_Handler):
+    stub: "StubNewsAPI"
+
+    def do_GET(self):
+        if not self.stub._admit():
+            self._send(self.stub.rng.choice([429, 500, 503]), {"status": "error"})
+            return
+        q = parse_qs(urlparse(self.path).query)
+        terms = set(_TOKEN.findall(q.get("q", [""])[0].lower()))
+        since = q.get("from", [""])[0]
+        page_size = int(q.get("pageSize", ["100"])[0])
+        page = int(q.get("page", ["1"])[0])
+        hits = [
+            a for a, toks in zip(self.stub.articles, self.stub.tokens)
+            if a["publishedAt"] >= since and terms <= toks
+        ]
+        start = (page - 1) * page_size
+        self._send(200, {
+            "status": "ok",
+            "totalResults": len(hits),
+            "articles": hits[start:start + page_size],
+        })
+
+
+class StubNewsAPI(_StubServer):
+    def __init__(self, articles: list[dict], latency_ms: float = 0, error_rate: float = 0, seed: int = 1):
+        super().__init__(_NewsHandler, latency_ms, error_rate, seed)
+        self.set_articles(articles)
+
+    def set_articles(self, articles: list[dict]) -> None:
+        self.articles = articles
+        self.tokens = [
+            set(_TOKEN.findall(f"{a['title']} {a.get('description') or ''}".lower())) for a in articles
+        ]
+
+    @property
+    def endpoint(self) -> str:
+        return f"{self.url}/v2/everything"
+
+
+class _GeminiHandler(_Handler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.stub._admit():
+            self._send(self.stub.rng.choice([429, 500, 503]), {"error": {"code": 503, "message": "stub"}})
+            return
+        prompt = "".join(
+            p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", [])
+        )
+        text = _summary_reply(prompt) if "Summarize a news cluster" in prompt else _tiles_reply(prompt)
+        self._send(200, {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0,
+            }]
+        })
+
+
+def _payload(prompt: str):
+    # prompt 里第一段 JSON（两个空行之间）就是输入
+    try:
+        return json.loads(prompt.split("\n\n")[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _tiles_reply(prompt: str) -> str:
+    items = _payload(prompt) or []
+    types = ["FACT", "ANALYSIS", "OPINION", "UNVERIFIED"]
+    out = [
+        {
+            "i": it.get("i", n),
+            "type": types[len(it.get("title", "")) % len(types)],
+            "topic_tags": it.get("title", "").lower().split()[:2],
+            "one_line_takeaway": it.get("title", "")[:120],
+            "confidence": 0.8,
+        }
+        for n, it in enumerate(items if isinstance(items, list) else [])
+    ]
+    return "```json\n" + json.dumps(out) + "\n```"
+
+
+def _summary_reply(prompt: str) -> str:
+    items = (_payload(prompt) or {}).get("items", [])
+    first = items[0]["title"] if items else "Cluster"
+    return json.dumps({
+        "cluster_title": first[:80],
+        "whole_story": {
+            "what_happened": f"{len(items)} related reports.",
+            "why_it_matters": ["Synthetic benchmark cluster."],
+            "what_to_watch": ["Nothing; this is a stub."],
+        },
+        "timeline": [{"time": it.get("published_at", ""), "event": it.get("title", "")[:120]} for it in items[:3]],
+    })
+
+
+class StubGemini(_StubServer):
+    def __init__(self, latency_ms: float = 0, error_rate: float = 0, seed: int = 2):
+        super().__init__(_GeminiHandler, latency_ms, error_rate, seed)
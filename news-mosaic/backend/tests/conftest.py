@@ -0,0 +1,14 @@
+import os
+import tempfile
+from pathlib import Path
+
+# app.settings 在 import 时读环境变量，所以必须在 import app 之前设置
+_tmp = tempfile.mkdtemp(prefix="news-mosaic-tests-")
+os.environ.update({
+    "CACHE_PATH": os.path.join(_tmp, "cache.sqlite3"),
+    "STORE_PATH": os.path.join(_tmp, "articles.sqlite3"),
+    "CPU_WORKERS": "0",
+    "PREFETCH_ENABLED": "0",
+    "PROFILE_REQUESTS": "0",
+})
+os.environ.setdefault("NLTK_DATA", str(Path(__file__).resolve().parents[1] / "nltk_data"))
@@ -0,0 +1,140 @@
+import asyncio
+
+from app.cache import Degraded, ResponseCache
+
+
+def _counting_build(values, gate=None):
+    calls = []
+
+    async def build():
+        calls.append(len(calls))
+        if gate is not None:
+            await gate.wait()
+        return values[min(len(calls), len(values)) - 1]
+
+    return build, calls
+
+
+def test_concurrent_identical_requests_share_one_build():
+    async def main():
+        cache = ResponseCache(ttl_s=60, stale_s=60, max_entries=8)
+        gate = asyncio.Event()
+        build, calls = _counting_build(["mosaic"], gate)
+        waiters = [asyncio.create_task(cache.get_or_build("k", build)) for _ in range(5)]
+        await asyncio.sleep(0)
+        gate.set()
+        results = await asyncio.gather(*waiters)
+        return cache, calls, results
+
+    cache, calls, results = asyncio.run(main())
+    assert results == ["mosaic"] * 5
+    assert len(calls) == 1
+    assert cache.misses == 1 and cache.coalesced == 4
+    assert cache.stats()["inflight"] == 0
+
+
+def test_stale_entry_is_served_while_rebuilding():
+    async def main():
+        cache = ResponseCache(ttl_s=0.05, stale_s=60, max_entries=8)
+        gate = asyncio.Event()
+        build, calls = _counting_build(["old", "new"], gate)
+        gate.set()
+        assert await cache.get_or_build("k", build) == "old"
+        await asyncio.sleep(0.1)
+
+        gate.clear()
+        stale = await cache.get_or_build("k", build)
+        rebuilding = cache.stats()["inflight"]
+        gate.set()
+        await asyncio.sleep(0.01)
+        return cache, calls, stale, rebuilding, await cache.get_or_build("k", build)
+
+    cache, calls, stale, rebuilding, fresh = asyncio.run(main())
+    assert stale == "old"
+    assert rebuilding == 1
+    assert fresh == "new"
+    assert len(calls) == 2
+    assert cache.stale_hits == 1 and cache.hits == 1
+
+
+def test_degraded_entry_expires_after_degraded_ttl():
+    async def main():
+        cache = ResponseCache(ttl_s=60, stale_s=60, max_entries=8, degraded_ttl_s=0.05)
+        results = []
+
+        async def build():
+            results.append(None)
+            return Degraded("partial") if len(results) == 1 else "full"
+
+        first = await cache.get_or_build("k", build)
+        again = await cache.get_or_build("k", build)
+        degraded = cache.degraded("k")
+        await asyncio.sleep(0.1)
+        # 过期的 degraded 结果不走 stale-while-revalidate，直接重建
+        rebuilt = await cache.get_or_build("k", build)
+        return cache, results, (first, again, degraded, rebuilt)
+
+    cache, results, (first, again, degraded, rebuilt) = asyncio.run(main())
+    assert (first, again, rebuilt) == ("partial", "partial", "full")
+    assert degraded
+    assert len(results) == 2
+    assert cache.degraded_builds == 1
+    assert not cache.degraded("k")
+
+
+def test_degraded_entry_not_cached_without_degraded_ttl():
+    async def main():
+        cache = ResponseCache(ttl_s=60, stale_s=60, max_entries=8)
+
+        async def build():
+            return Degraded("partial")
+
+        return cache, await cache.get_or_build("k", build)
+
+    cache, value = asyncio.run(main())
+    assert value == "partial"
+    assert cache.age("k") is None
+
+
+def test_interactive_request_replaces_background_build():
+    async def main():
+        cache = ResponseCache(ttl_s=60, stale_s=60, max_entries=8)
+        slow_gate = asyncio.Event()
+
+        async def slow():
+            await slow_gate.wait()
+            return "prefetched"
+
+        async def fast():
+            return "interactive"
+
+        refresh = asyncio.create_task(cache.refresh("k", slow))
+        await asyncio.sleep(0)
+        value = await asyncio.wait_for(cache.get_or_build("k", fast), timeout=1)
+        slow_gate.set()
+        return cache, value, await refresh, await cache.get_or_build("k", fast)
+
+    cache, value, refreshed, cached = asyncio.run(main())
+    assert value == "interactive"
+    assert refreshed == "prefetched"
+    # 后台那次跑完不会覆盖交互构建写进缓存的结果
+    assert cached == "interactive"
+    assert cache.stats()["inflight"] == 0
+
+
+def test_claim_joins_interactive_build():
+    async def main():
+        cache = ResponseCache(ttl_s=60, stale_s=60, max_entries=8)
+        gate = asyncio.Event()
+        build, calls = _counting_build(["mosaic"], gate)
+        _, owned, owner = cache.claim("k", build)
+        _, joined, joined_owner = cache.claim("k", build)
+        gate.set()
+        await owned
+        value, task, _ = cache.claim("k", build)
+        return calls, (owned is joined, owner, joined_owner), value, task
+
+    calls, (same, owner, joined_owner), value, task = asyncio.run(main())
+    assert same and owner and not joined_owner
+    assert len(calls) == 1
+    assert value == "mosaic" and task is None
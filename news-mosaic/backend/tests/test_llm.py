@@ -0,0 +1,80 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.llm import classify_tiles
+from app.models import Article
+
+
+class StubModel:
+    """Stands in for GenerativeModel; replies with canned text and records prompts."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        items = json.loads(prompt.split("\n\n")[1])
+        return SimpleNamespace(text=self.reply(items))
+
+
+def _articles(tag: str, n: int) -> list[Article]:
+    return [
+        Article(
+            id=f"{tag}-{i}",
+            title=f"{tag} headline number {i}",
+            snippet=f"snippet {i}",
+            source="Stub Wire",
+            published_at=f"2026-10-0{i % 9 + 1}T00:00:00Z",
+            url=f"https://example.com/{tag}/{i}",
+        )
+        for i in range(n)
+    ]
+
+
+def _label(i: int, **extra) -> dict:
+    return {"i": i, "type": "ANALYSIS", "topic_tags": ["t"], "one_line_takeaway": f"take {i}",
+            "confidence": 0.9, **extra}
+
+
+def test_malformed_items_fall_back_individually():
+    # 第 1 条不是对象、第 2 条 confidence 不是数字、第 3 条缺失，只有第 0 条用 LLM 结果
+    def reply(items):
+        return "```json\n" + json.dumps([_label(0), "oops", _label(2, confidence="high")]) + "\n```"
+
+    articles = _articles("per-item", 4)
+    model = StubModel(reply)
+    tiles = asyncio.run(classify_tiles(articles, model=model))
+
+    assert len(model.prompts) == 1
+    assert [t.article.id for t in tiles] == [a.id for a in articles]
+    assert (tiles[0].tile_type, tiles[0].one_line_takeaway, tiles[0].confidence) == ("ANALYSIS", "take 0", 0.9)
+    for t in tiles[1:]:
+        assert t.tile_type == "FACT" and t.confidence == 0.4
+
+
+def test_unparseable_batch_falls_back_without_failing_other_batches(monkeypatch):
+    monkeypatch.setattr("app.llm.LLM_BATCH_SIZE", 2)
+
+    def reply(items):
+        if items[0]["title"].endswith(" 0"):
+            return "not json at all"
+        return json.dumps([_label(it["i"]) for it in items])
+
+    tiles = asyncio.run(classify_tiles(_articles("batch", 4), model=StubModel(reply)))
+
+    assert [t.tile_type for t in tiles] == ["FACT", "FACT", "ANALYSIS", "ANALYSIS"]
+    assert [t.confidence for t in tiles] == [0.4, 0.4, 0.9, 0.9]
+
+
+def test_labels_are_cached_by_content():
+    articles = _articles("cached", 3)
+    first = StubModel(lambda items: json.dumps([_label(it["i"]) for it in items]))
+    asyncio.run(classify_tiles(articles, model=first))
+
+    second = StubModel(lambda items: "unused")
+    tiles = asyncio.run(classify_tiles(articles, model=second))
+
+    assert second.prompts == []
+    assert all(t.tile_type == "ANALYSIS" for t in tiles)
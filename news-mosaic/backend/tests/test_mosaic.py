@@ -0,0 +1,60 @@
+from app import mosaic
+from app.models import Article
+
+STORIES = {
+    "quake": "earthquake magnitude tremor coastal evacuation seismic rescue",
+    "vote": "parliament budget vote coalition minister opposition ballot",
+    "storm": "hurricane landfall flooding winds rainfall forecast shelters",
+}
+
+
+def _articles(story: str, start: int, n: int) -> list[Article]:
+    return [
+        Article(
+            id=f"{story}-{i}",
+            title=f"{STORIES[story]} report {i}",
+            snippet=STORIES[story],
+            source="Stub Wire",
+            published_at=f"2026-10-10T{i % 24:02d}:00:00Z",
+            url=f"https://example.com/{story}/{i}",
+        )
+        for i in range(start, start + n)
+    ]
+
+
+def _ids(clustered: dict) -> dict[str, str]:
+    return {a.id: cid for cid, items in clustered.items() for a in items}
+
+
+def test_choose_k_adaptive_leaves_headroom():
+    assert mosaic.choose_k_adaptive(2000) == mosaic.CLUSTER_MAX_K // 2
+
+
+def test_ids_are_stable_and_new_stories_open_clusters():
+    clusterer = mosaic.IncrementalClusterer()
+    first = _ids(clusterer.cluster("topic", _articles("quake", 0, 4) + _articles("vote", 0, 4)))
+    assert first["quake-0"] != first["vote-0"]
+
+    second = _ids(clusterer.cluster(
+        "topic", _articles("quake", 0, 6) + _articles("vote", 0, 4) + _articles("storm", 0, 3)
+    ))
+    # 老文章沿用原来的簇 id，同一事件的新文章归进老簇，新事件开新簇
+    assert {k: second[k] for k in first} == first
+    assert second["quake-5"] == first["quake-0"]
+    assert second["storm-0"] not in first.values()
+    assert len({second[f"storm-{i}"] for i in range(3)}) == 1
+
+
+def test_stale_clusters_are_retired_when_full(monkeypatch):
+    monkeypatch.setattr(mosaic, "CLUSTER_MAX_K", 2)
+    monkeypatch.setattr(mosaic, "CLUSTER_STALE_S", 0)
+    clusterer = mosaic.IncrementalClusterer()
+    first = _ids(clusterer.cluster("topic", _articles("quake", 0, 3)))
+    second = _ids(clusterer.cluster("topic", _articles("vote", 0, 3)))
+    third = _ids(clusterer.cluster("topic", _articles("storm", 0, 3)))
+
+    seen = set(first.values()) | set(second.values())
+    assert len(seen) == 2
+    # 簇已满，但老簇都过时了：风暴开新簇，而不是硬塞进最近的老簇
+    assert third["storm-0"] not in seen
+    assert clusterer.stats()["retired"] == 2
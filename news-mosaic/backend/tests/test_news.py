@@ -0,0 +1,112 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import news
+from bench.stubs import StubNewsAPI
+
+
+def _raw(i: int) -> dict:
+    return {
+        "title": f"Climate policy update {i}",
+        "description": f"Details on climate policy item {i}.",
+        "url": f"https://example.com/{i}",
+        "publishedAt": f"2026-10-{10 + i % 5:02d}T{i % 24:02d}:00:00Z",
+        "source": {"name": "Stub Wire"},
+    }
+
+
+def _fetch(*args, transport=None):
+    async def main():
+        if transport is not None:
+            news._client = httpx.AsyncClient(transport=transport)
+        try:
+            return await news._fetch_remote(*args)
+        finally:
+            await news.close_client()
+
+    return asyncio.run(main())
+
+
+def test_retries_429_after_retry_after(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(news.asyncio, "sleep", fake_sleep)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "2"})
+        return httpx.Response(200, json={"status": "ok", "totalResults": 1, "articles": [_raw(0)]})
+
+    articles = _fetch("climate", "2026-10-01T00:00:00Z", 10, transport=httpx.MockTransport(handler))
+
+    assert len(calls) == 2
+    assert sleeps == [2.0]
+    assert [a.title for a in articles] == ["Climate policy update 0"]
+
+
+def test_gives_up_when_retry_after_exceeds_limit(monkeypatch):
+    monkeypatch.setattr(news, "NEWS_MAX_RETRY_AFTER_S", 5)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(429, headers={"Retry-After": "60"})
+
+    with pytest.raises(httpx.HTTPStatusError):
+        _fetch("climate", "2026-10-01T00:00:00Z", 10, transport=httpx.MockTransport(handler))
+    assert len(calls) == 1
+
+
+def test_fetches_all_pages_in_order(monkeypatch):
+    stub = StubNewsAPI([_raw(i) for i in range(250)]).start()
+    try:
+        monkeypatch.setattr(news, "NEWS_API_URL", stub.endpoint)
+        monkeypatch.setattr(news, "NEWS_PAGE_SIZE", 100)
+        articles = _fetch("climate policy", "2026-10-01T00:00:00Z", 220)
+    finally:
+        stub.stop()
+
+    assert stub.requests == 3
+    assert [a.title for a in articles] == [f"Climate policy update {i}" for i in range(220)]
+
+
+def test_stops_at_total_results(monkeypatch):
+    stub = StubNewsAPI([_raw(i) for i in range(120)]).start()
+    try:
+        monkeypatch.setattr(news, "NEWS_API_URL", stub.endpoint)
+        monkeypatch.setattr(news, "NEWS_PAGE_SIZE", 50)
+        articles = _fetch("climate", "2026-10-01T00:00:00Z", 500)
+    finally:
+        stub.stop()
+
+    assert stub.requests == 3
+    assert len(articles) == 120
+
+
+def test_gap_fetch_overlaps_the_indexing_lag(monkeypatch):
+    # 第二次请求从 now - STORE_INDEX_LAG_S 开始补：上次拉完之后才入索引的旧文章还能拿到
+    monkeypatch.setattr(news, "NEWS_API_KEY", "test")
+    monkeypatch.setattr(news, "STORE_INDEX_LAG_S", 3600)
+    monkeypatch.setattr(news, "STORE_MIN_REFRESH_S", 0)
+    calls = []
+
+    async def fake_remote(query, since, max_articles):
+        calls.append(since)
+        return [news._parse_articles({"articles": [_raw(len(calls))]})[0]]
+
+    monkeypatch.setattr(news, "_fetch_remote", fake_remote)
+    asyncio.run(news.fetch_news("overlap lag", 7, 50))
+    cov = news.article_store.coverage(["lag", "overlap"], calls[0])
+    articles = asyncio.run(news.fetch_news("overlap lag", 7, 50))
+
+    lag_start = news.iso_utc(news.datetime.now(news.timezone.utc) - news.timedelta(seconds=3600))
+    assert cov is not None and cov[2] and cov[1] <= lag_start
+    assert len(calls) == 2 and calls[1] == cov[1]
+    assert len(articles) == 2
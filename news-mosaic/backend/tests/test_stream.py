@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+import httpx
+
+from app import main
+from app.llm import fallback_cluster_summary, fallback_tile
+
+
+def test_joining_stream_replays_and_follows_progressive_events(monkeypatch):
+    started = asyncio.Event()
+    gate = asyncio.Event()
+
+    async def gated_enrichment(clustered, deadline_s=None, fallbacks=None):
+        # 第一个簇的 tiles 发出后停住，让第二个流在构建中途 join
+        for n, (cid, items) in enumerate(clustered.items()):
+            yield "tiles", cid, [fallback_tile(a) for a in items]
+            if n == 0:
+                started.set()
+                await gate.wait()
+            yield "summary", cid, fallback_cluster_summary(items)
+
+    monkeypatch.setattr(main, "iter_enrichment", gated_enrichment)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            body = {"query": "stream join replay", "days": 3, "max_articles": 10}
+
+            async def stream():
+                resp = await client.post("/mosaic-stream", json=body)
+                return [json.loads(line)["type"] for line in resp.text.splitlines()]
+
+            first = asyncio.create_task(stream())
+            await started.wait()
+            second = asyncio.create_task(stream())
+            await asyncio.sleep(0.05)
+            gate.set()
+            return await first, await second
+
+    first, second = asyncio.run(run())
+
+    assert first[0] == "layout" and first[-1] == "done"
+    assert "summary" in first
+    assert second == first
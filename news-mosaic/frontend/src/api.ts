@@ -31,3 +31,40 @@ export async function fetchClusterTiles(items: any[]) {
   const res = await api.post("/cluster-tiles", { items });
   return res.data;
 }
+
+export type MosaicStreamEvent =
+  | { type: "layout"; clusters: any[] }
+  | { type: "tiles"; cluster_id: string; tiles: any[] }
+  | { type: "summary"; cluster_id: string; summary: any }
+  | { type: "done" };
+
+// NDJSON 流：先收到 lite 布局，再逐簇收到 tiles / summary
+export async function streamMosaic(
+  query: string,
+  onEvent: (event: MosaicStreamEvent) => void,
+) {
+  const res = await fetch(`${api.defaults.baseURL}/mosaic-stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ query, days: 7, max_articles: 50 }),
+  });
+  if (!res.ok || !res.body) {
+    throw new Error(`mosaic-stream failed: ${res.status}`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = "";
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+    let nl: number;
+    while ((nl = buf.indexOf("\n")) >= 0) {
+      const line = buf.slice(0, nl).trim();
+      buf = buf.slice(nl + 1);
+      if (line) onEvent(JSON.parse(line));
+    }
+  }
+  if (buf.trim()) onEvent(JSON.parse(buf));
+}
@@ -1,7 +1,7 @@
 import "../styles.css";
 import { useMemo, useState, useCallback, useRef, useEffect } from "react";
 import * as d3 from "d3";
-import { buildMosaicLite, fetchClusterSummary } from "../api";
+import { buildMosaicLite, fetchClusterSummary, streamMosaic } from "../api";
 import logoPng from "../assets/logo.png"
 
 /* ══════════════════════════════════════════
@@ -749,17 +749,45 @@ export default function Mosaic() {
   const [searchFocused, setSearchFocused] = useState(false);
   const searchRef = useRef<HTMLInputElement>(null);
 
+  const runId = useRef(0);
+
   const run = useCallback(async (q: string) => {
+    const token = ++runId.current;
     setLoading(true);
     setPicked(null);
     setExpandedCluster(null);
     setSummaryLoading({});
     setAutoLoadAllSummaries(false);
     try {
+      await streamMosaic(q, (ev) => {
+        if (token !== runId.current) return;
+        if (ev.type === "layout") {
+          const layout: Cluster[] = ev.clusters || [];
+          setClusters(layout);
+          // Summaries arrive on the stream; mark them loading so we don't also fetch per cluster
+          setSummaryLoading(Object.fromEntries(layout.map((c) => [c.cluster_id, true])));
+          setLoading(false);
+        } else if (ev.type === "tiles") {
+          setClusters((prev) =>
+            prev.map((c) => (c.cluster_id === ev.cluster_id ? { ...c, items: ev.tiles } : c))
+          );
+        } else if (ev.type === "summary") {
+          setClusters((prev) =>
+            prev.map((c) => (c.cluster_id === ev.cluster_id ? { ...c, summary: ev.summary } : c))
+          );
+          setSummaryLoading((s) => ({ ...s, [ev.cluster_id]: false }));
+        }
+      });
+    } catch {
+      if (token !== runId.current) return;
+      // Stream unavailable: fall back to lite layout + per-cluster summaries
       const data = await buildMosaicLite(q);
       setClusters(data || []);
     } finally {
-      setLoading(false);
+      if (token === runId.current) {
+        setLoading(false);
+        setSummaryLoading({});
+      }
     }
   }, []);
 